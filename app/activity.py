@@ -0,0 +1,164 @@
+"""Daily activity rollups, maintained as part of every write.
+
+Session hooks count the sources added, notes written and insights moved to
+``validated`` by each flush, keyed by day, topic and author, and fold them
+into ``activity_rollups`` with one upsert just before the transaction
+commits. Counts record events, so deleting a row later does not lower them.
+Weekly buckets are summed from the daily rows at read time.
+
+``rebuild()`` recomputes the table from the raw rows; it runs as a job when
+the table is found empty at startup on a database that already has data.
+"""
+from collections import Counter
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+SOURCES_ADDED = "sources_added"
+NOTES_WRITTEN = "notes_written"
+INSIGHTS_VALIDATED = "insights_validated"
+METRICS = (SOURCES_ADDED, NOTES_WRITTEN, INSIGHTS_VALIDATED)
+
+RollupKey = Tuple[date, int, str, str]   # day, topic_id, author, metric
+
+
+def _counts(session: Session) -> Counter:
+    return session.info.setdefault("activity", Counter())
+
+
+def _key(day, topic_id: Optional[int], author: Optional[str], metric: str) -> RollupKey:
+    return day, topic_id or 0, author or "", metric
+
+
+def _when(obj) -> date:
+    return (obj.created_at or datetime.utcnow()).date()
+
+
+def record_bulk_update(session: Session, model, ids, values: dict) -> None:
+    """Count insights a set-based UPDATE is about to validate; call it before executing the statement."""
+    if model is not models.Insight or values.get("status") != "validated":
+        return
+    today = datetime.utcnow().date()
+    counts = _counts(session)
+    for topic_id, author in session.execute(
+        select(models.Insight.topic_id, models.Insight.author)
+        .where(models.Insight.id.in_(ids), models.Insight.status != "validated")
+    ):
+        counts[_key(today, values.get("topic_id", topic_id), values.get("author", author), INSIGHTS_VALIDATED)] += 1
+
+
+def record_bulk_insert(session: Session, model, rows) -> None:
+    """Count notes a set-based INSERT writes, which the flush hooks never see."""
+    if model is not models.Note:
+        return
+    counts = _counts(session)
+    for row in rows:
+        counts[_key(row["created_at"].date(), row.get("topic_id"), row.get("author"), NOTES_WRITTEN)] += 1
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capture_activity(session, flush_context):
+    counts = _counts(session)
+    for obj in session.new:
+        if isinstance(obj, models.Source):
+            counts[_key(_when(obj), obj.topic_id, obj.added_by, SOURCES_ADDED)] += 1
+        elif isinstance(obj, models.Note):
+            counts[_key(_when(obj), obj.topic_id, obj.author, NOTES_WRITTEN)] += 1
+        elif isinstance(obj, models.Insight) and obj.status == "validated":
+            counts[_key(_when(obj), obj.topic_id, obj.author, INSIGHTS_VALIDATED)] += 1
+    today = datetime.utcnow().date()
+    for obj in session.dirty:
+        if isinstance(obj, models.Insight) and obj.status == "validated":
+            history = inspect(obj).attrs.status.history
+            if history.has_changes() and "validated" not in history.deleted:
+                counts[_key(today, obj.topic_id, obj.author, INSIGHTS_VALIDATED)] += 1
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _write_rollups(session):
+    session.flush()
+    counts = session.info.pop("activity", None)
+    if not counts:
+        return
+    # A fixed key order keeps concurrent upserts of the same rows from deadlocking
+    rows = [
+        {"day": day, "topic_id": topic_id, "author": author, "metric": metric, "count": n}
+        for (day, topic_id, author, metric), n in sorted(counts.items())
+    ]
+    _upsert(session, rows)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_counts(session, previous_transaction):
+    session.info.pop("activity", None)
+
+
+def _upsert(session: Session, rows: list) -> None:
+    table = models.ActivityRollup
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in rows:
+            existing = session.get(table, (row["day"], row["topic_id"], row["author"], row["metric"]))
+            if existing is None:
+                session.add(table(**row))
+            else:
+                existing.count += row["count"]
+        session.flush()
+        return
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.day, table.topic_id, table.author, table.metric],
+        set_={"count": table.count + stmt.excluded.count},
+    )
+    session.execute(stmt, rows)
+
+
+# ── Backfill ──────────────────────────────────────────────────────────────────
+
+def needs_rebuild(db: Session) -> bool:
+    if db.query(models.ActivityRollup.day).first() is not None:
+        return False
+    return db.query(models.Source.id).first() is not None or db.query(models.Note.id).first() is not None
+
+
+def rebuild(db: Session) -> int:
+    """Replace the rollups with counts computed from the raw rows. Returns the number of rollup rows."""
+    # Validation time is not stored, so a validated insight counts on its last update
+    sources = (models.Source, models.Source.added_by, models.Source.created_at, SOURCES_ADDED, ())
+    notes = (models.Note, models.Note.author, models.Note.created_at, NOTES_WRITTEN, ())
+    insights = (models.Insight, models.Insight.author, models.Insight.updated_at, INSIGHTS_VALIDATED,
+                (models.Insight.status == "validated",))
+    # Concurrent writes upsert their own counts as they commit. Holding them
+    # off from here to the commit counts each write exactly once: here, if it
+    # committed first, or by its own upsert afterwards. On Postgres that is a
+    # table lock conflicting with their upserts; on SQLite this first write
+    # takes the database's write lock.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {models.ActivityRollup.__tablename__} IN EXCLUSIVE MODE"))
+    db.execute(delete(models.ActivityRollup))
+    counts: Counter = Counter()
+    for model, author, stamp, metric, criteria in (sources, notes, insights):
+        day = func.date(stamp)
+        for day_value, topic_id, author_value, n in db.execute(
+            select(day, model.topic_id, author, func.count()).where(*criteria).group_by(day, model.topic_id, author)
+        ):
+            if isinstance(day_value, str):
+                day_value = date.fromisoformat(day_value)
+            counts[_key(day_value, topic_id, author_value, metric)] += n
+    rows = [
+        {"day": day, "topic_id": topic_id, "author": author, "metric": metric, "count": n}
+        for (day, topic_id, author, metric), n in sorted(counts.items())
+    ]
+    if rows:
+        db.execute(insert(models.ActivityRollup), rows)
+    db.commit()
+    return len(rows)
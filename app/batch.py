@@ -0,0 +1,15 @@
+from typing import Iterable, List, Tuple
+from sqlalchemy import ARRAY, Integer, any_, literal
+from sqlalchemy.orm import Session
+
+
+def fetch_in_order(db: Session, model, ids: Iterable[int]) -> Tuple[List, List[int]]:
+    """Load rows by primary key in one query, returning them in request order plus the ids not found."""
+    wanted = list(dict.fromkeys(ids))
+    if db.get_bind().dialect.name == "postgresql":
+        # One array parameter keeps a single cached plan whatever the list length
+        condition = model.id == any_(literal(wanted, ARRAY(Integer)))
+    else:
+        condition = model.id.in_(wanted)
+    found = {obj.id: obj for obj in db.query(model).filter(condition)}
+    return [found[i] for i in wanted if i in found], [i for i in wanted if i not in found]
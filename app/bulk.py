@@ -0,0 +1,68 @@
+"""Set-based bulk UPDATE/DELETE over the same filters as the list endpoints.
+
+Matching rows are walked in primary-key order, ``BULK_CHUNK_SIZE`` at a time,
+and each chunk is written and committed on its own so no statement holds row
+locks on the whole match set. A bulk request is therefore not atomic: if it
+fails part-way, the chunks already committed stay written.
+"""
+import os
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app import activity, changelog, evidence, suggest
+
+CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+
+def count_matching(db: Session, model, criteria: list) -> int:
+    return db.execute(select(func.count()).select_from(model).where(*criteria)).scalar()
+
+
+def apply_in_chunks(
+    db: Session,
+    model,
+    criteria: list,
+    values: Optional[dict] = None,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Update ``model`` rows matching ``criteria`` with ``values``, or delete them when ``values`` is None.
+
+    ``on_chunk`` is called with each chunk's row count before that chunk commits.
+    Returns the number of rows written.
+    """
+    entity = changelog.ENTITIES[model]
+    if values is not None:
+        values = {**values, "updated_at": datetime.utcnow(), "version": model.version + 1}
+    written = 0
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(model.id).where(*criteria, model.id > last_id).order_by(model.id).limit(CHUNK_SIZE)
+        ).scalars().all()
+        if not ids:
+            return written
+        last_id = ids[-1]
+        # Re-check the filter so rows changed since the scan above are left alone
+        if values is None:
+            changelog.record_cascades(db, model, ids)
+            stmt = delete(model).where(model.id.in_(ids), *criteria)
+            op = "delete"
+        else:
+            activity.record_bulk_update(db, model, ids, values)
+            evidence.record_bulk_update(db, model, ids, values)
+            suggest.record_bulk_update(db, model, values)
+            stmt = update(model).where(model.id.in_(ids), *criteria).values(values)
+            op = "update"
+        rows = db.execute(
+            stmt.returning(model.id, model.topic_id).execution_options(synchronize_session=False)
+        ).all()
+        changelog.record(db, entity, [row.id for row in rows], op, {row.id: row.topic_id for row in rows})
+        if on_chunk is not None:
+            on_chunk(len(rows))
+        db.commit()
+        written += len(rows)
+        if len(ids) < CHUNK_SIZE:
+            return written
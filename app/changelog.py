@@ -0,0 +1,120 @@
+"""Capture every committed write into the ``changes`` table.
+
+Session hooks collect the rows each flush creates, updates or deletes --
+including rows the database changes on its own through ``ON DELETE``
+cascades -- and append them to the change log just before the transaction
+commits. On Postgres the append runs under a transaction-scoped advisory
+lock, so change ids are handed out in commit order and a reader that has
+seen id N can never later find a committed change with a smaller id. The
+same transaction notifies ``app.events`` listeners, delivered on commit.
+"""
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+ENTITIES = {
+    models.Topic: "topic",
+    models.Source: "source",
+    models.Note: "note",
+    models.Insight: "insight",
+    models.Collection: "collection",
+}
+
+
+def _cited_by(source_ids):
+    return select(models.InsightEvidence.insight_id).where(models.InsightEvidence.source_id.in_(source_ids))
+
+
+# Rows the database rewrites when a parent is deleted: (child, fk column or id subquery, resulting op)
+_DB_CASCADES = {
+    models.Topic: [
+        (models.Insight, "topic_id", "delete"),
+        (models.Source, "topic_id", "update"),
+        (models.Note, "topic_id", "update"),
+    ],
+    models.Source: [
+        (models.Note, "source_id", "update"),
+        (models.Insight, _cited_by, "update"),   # the insight loses an evidence link
+    ],
+}
+
+_ADVISORY_LOCK_KEY = 0x52500001
+NOTIFY_CHANNEL = "researchpro_changes"
+
+PendingChange = Tuple[str, int, str, object]   # entity, entity_id, op, topic_id
+
+
+def _pending(session: Session) -> List[PendingChange]:
+    return session.info.setdefault("pending_changes", [])
+
+
+def _topic_id(obj):
+    return obj.id if isinstance(obj, models.Topic) else getattr(obj, "topic_id", None)
+
+
+def record(session: Session, entity: str, ids, op: str, topic_ids=None) -> None:
+    """Log changes made behind the ORM's back, e.g. by set-based UPDATE/DELETE statements."""
+    topic_ids = topic_ids or {}
+    _pending(session).extend((entity, i, op, topic_ids.get(i)) for i in ids)
+
+
+def record_cascades(session: Session, model, ids) -> None:
+    """Log the rows the database will rewrite through ``ON DELETE`` when ``ids`` of ``model`` are deleted."""
+    for child, column, op in _DB_CASCADES.get(model, ()):
+        criterion = child.id.in_(column(ids)) if callable(column) else getattr(child, column).in_(ids)
+        rows = session.execute(select(child.id, child.topic_id).where(criterion)).all()
+        # A cascaded delete of the topic's insights still belongs to that topic
+        _pending(session).extend(
+            (ENTITIES[child], row_id, op, topic_id if op == "delete" else None)
+            for row_id, topic_id in rows
+        )
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _capture_db_cascades(session, flush_context, instances):
+    for obj in session.deleted:
+        record_cascades(session, type(obj), [obj.id])
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capture_flush(session, flush_context):
+    pending = _pending(session)
+    for obj in session.new:
+        if type(obj) in ENTITIES:
+            pending.append((ENTITIES[type(obj)], obj.id, "create", _topic_id(obj)))
+    for obj in session.dirty:
+        if type(obj) in ENTITIES and session.is_modified(obj, include_collections=False):
+            pending.append((ENTITIES[type(obj)], obj.id, "update", _topic_id(obj)))
+    for obj in session.deleted:
+        if type(obj) in ENTITIES:
+            pending.append((ENTITIES[type(obj)], obj.id, "delete", _topic_id(obj)))
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _append_change_log(session):
+    session.flush()
+    pending = session.info.pop("pending_changes", None)
+    if not pending:
+        return
+    postgres = session.get_bind().dialect.name == "postgresql"
+    if postgres:
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    now = datetime.utcnow()
+    session.execute(insert(models.Change), [
+        {"entity": entity, "entity_id": entity_id, "op": op, "topic_id": topic_id, "changed_at": now}
+        for entity, entity_id, op, topic_id in pending
+    ])
+    if postgres:
+        session.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+    session.info["changes_logged"] = True
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop("pending_changes", None)
+    session.info.pop("changes_logged", None)
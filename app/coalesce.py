@@ -0,0 +1,150 @@
+"""Single-flight request coalescing for hot aggregate endpoints.
+
+Concurrent identical ``GET`` requests -- same path, query string and auth
+scope -- share the response of the first one (the leader) instead of each
+running the full query set. Optionally a successful response is reused for
+``COALESCE_FRESH_SECONDS`` afterwards, and for a further
+``COALESCE_STALE_SECONDS`` it is served stale while a single background
+request refreshes it.
+
+The coalescing ratio is ``sum(rate(researchpro_coalesce_requests_total{outcome!="leader"}[5m]))``
+over ``sum(rate(researchpro_coalesce_requests_total[5m]))``.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from app import metrics
+
+FRESH_SECONDS = float(os.getenv("COALESCE_FRESH_SECONDS", "0"))
+STALE_SECONDS = float(os.getenv("COALESCE_STALE_SECONDS", "0"))
+
+# Request headers that change what the response looks like or who may see it
+_VARY_HEADERS = (b"x-api-token", b"cookie", b"accept", b"accept-encoding")
+
+COALESCED = metrics.Counter(
+    "researchpro_coalesce_requests_total",
+    "Coalescable requests by how they were served: leader (computed), follower (joined an "
+    "in-flight leader), fresh or stale (replayed from a recent response).",
+    ["route", "outcome"],
+)
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    stored_at: float
+
+
+def _key(scope) -> str:
+    digest = hashlib.sha256(scope["path"].encode())
+    digest.update(b"?" + b"&".join(sorted(scope.get("query_string", b"").split(b"&"))))
+    for name, value in sorted(scope["headers"]):
+        if name in _VARY_HEADERS:
+            digest.update(b"\0" + name + b"=" + value)
+    return digest.hexdigest()
+
+
+async def _replay(send, response: CachedResponse, outcome: str) -> None:
+    headers = list(response.headers)
+    if outcome != "leader":
+        headers.append((b"x-coalesced", outcome.encode()))
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    await send({"type": "http.response.body", "body": response.body})
+
+
+def _discard_result(task: asyncio.Future) -> None:
+    # A failed background refresh just leaves the stale copy in place
+    if not task.cancelled():
+        task.exception()
+
+
+async def _empty_receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+class CoalescingMiddleware:
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._recent: Dict[str, CachedResponse] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = _key(scope)
+        cached = self._recent.get(key)
+        if cached is not None:
+            age = time.monotonic() - cached.stored_at
+            if age < FRESH_SECONDS:
+                self._count(scope, "fresh")
+                await _replay(send, cached, "fresh")
+                return
+            if age < FRESH_SECONDS + STALE_SECONDS:
+                if key not in self._inflight:
+                    refresh = asyncio.ensure_future(self._lead(key, dict(scope), _empty_receive))
+                    refresh.add_done_callback(_discard_result)
+                self._count(scope, "stale")
+                await _replay(send, cached, "stale")
+                return
+
+        leader = self._inflight.get(key)
+        if leader is not None:
+            try:
+                response = await asyncio.shield(leader)
+            except (Exception, asyncio.CancelledError):
+                # The leader failed; run this request on its own rather than sharing the failure
+                await self.app(scope, receive, send)
+                return
+            self._count(scope, "follower")
+            await _replay(send, response, "follower")
+            return
+
+        self._count(scope, "leader")
+        response = await self._lead(key, scope, receive)
+        await _replay(send, response, "leader")
+
+    async def _lead(self, key: str, scope, receive) -> CachedResponse:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        start: dict = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, capture)
+            response = CachedResponse(start["status"], list(start.get("headers", [])), b"".join(chunks), time.monotonic())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # followers may not exist; mark it retrieved
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(response)
+        if response.status == 200 and (FRESH_SECONDS or STALE_SECONDS):
+            self._remember(key, response)
+        return response
+
+    def _remember(self, key: str, response: CachedResponse) -> None:
+        if len(self._recent) >= 1024:
+            horizon = time.monotonic() - FRESH_SECONDS - STALE_SECONDS
+            for stale_key in [k for k, r in self._recent.items() if r.stored_at < horizon]:
+                del self._recent[stale_key]
+        self._recent[key] = response
+
+    def _count(self, scope, outcome: str) -> None:
+        COALESCED.inc((scope["path"], outcome))
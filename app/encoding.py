@@ -0,0 +1,257 @@
+"""Response encodings: MessagePack bodies and negotiated compression.
+
+``MsgPackMiddleware`` re-encodes JSON API responses as MessagePack for
+clients that prefer ``application/msgpack`` in their ``Accept`` header. JSON
+clients keep FastAPI's direct-to-bytes serialisation path untouched.
+
+``CompressionMiddleware`` compresses bodies with the coding the client rates
+highest among ``COMPRESSION_ENCODINGS`` (default ``zstd,br,gzip``, whose order
+breaks ties). Bodies smaller than ``COMPRESSION_MIN_BYTES`` go out as is.
+Streamed bodies are compressed chunk by chunk and flushed after each one;
+Server-Sent Events are never compressed, so events are not held back.
+
+``msgpack``, ``brotli`` and ``zstandard`` are optional: a coding or media
+type whose package is missing is simply never negotiated.
+"""
+import json
+import os
+import zlib
+from typing import Callable, Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/javascript", "application/xml")
+
+
+def parse_qvalues(header: str) -> Dict[str, float]:
+    """``"gzip;q=0.8, br"`` -> ``{"gzip": 0.8, "br": 1.0}``."""
+    values = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        values[name.strip().lower()] = q
+    return values
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+# ── MessagePack ───────────────────────────────────────────────────────────────
+
+def wants_msgpack(accept: str) -> bool:
+    if msgpack is None or not accept:
+        return False
+    offered = parse_qvalues(accept)
+    q_msgpack = max(offered.get(t, 0.0) for t in MSGPACK_TYPES)
+    return q_msgpack > 0 and q_msgpack >= offered.get("application/json", 0.0)
+
+
+class MsgPackMiddleware:
+    def __init__(self, app, prefix: str = "/api/v1"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or msgpack is None or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        transcode = wants_msgpack(_header(scope, b"accept"))
+        start: dict = {}
+
+        async def send_encoded(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if headers.get("content-type", "").startswith("application/json"):
+                    # Caches must key JSON API bodies on Accept once MessagePack is on offer
+                    headers.add_vary_header("Accept")
+                    if transcode:
+                        start.update(message)
+                        return
+                await send(message)
+            elif start and message["type"] == "http.response.body" and not message.get("more_body", False):
+                raw = message.get("body", b"")
+                body = msgpack.packb(json.loads(raw), use_bin_type=True) if raw else raw
+                headers = MutableHeaders(scope=start)
+                headers["content-type"] = "application/msgpack"
+                headers["content-length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+            elif start:
+                # JSON responses are sent in one piece; anything streamed goes out unchanged
+                await send(start)
+                start.clear()
+                await send(message)
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_encoded)
+
+
+# ── Compression ───────────────────────────────────────────────────────────────
+
+class _Gzip:
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+ENCODERS: Dict[str, Callable] = {"gzip": _Gzip}
+if brotli is not None:
+    ENCODERS["br"] = _Brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _Zstd
+
+PREFERENCE = [
+    name.strip() for name in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    if name.strip() in ENCODERS
+]
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    offered = parse_qvalues(accept_encoding)
+    wildcard = offered.get("*", 0.0)
+    candidates = [(offered.get(name, wildcard), -rank, name) for rank, name in enumerate(PREFERENCE)]
+    # The client's q-values decide; our preference order only breaks ties
+    q, _, name = max(candidates, default=(0.0, 0, None))
+    return name if q > 0 else None
+
+
+def _compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(_header(scope, b"accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: dict = {}
+        encoder = None
+
+        async def send_compressed(message):
+            nonlocal encoder
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "content-encoding" in headers or not _compressible(headers.get("content-type", "")):
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                start.update(message)   # held until the first body chunk shows how big the body is
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None and start:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    start.clear()
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                headers = MutableHeaders(scope=start)
+                headers["content-encoding"] = encoding
+                del headers["content-length"]
+                if not more_body:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers["content-length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+                start.clear()
+            if encoder is None:
+                await send(message)
+            elif more_body:
+                await send({"type": "http.response.body", "body": encoder.compress(body) + encoder.flush(), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.compress(body) + encoder.finish()})
+
+        await self.app(scope, receive, send_compressed)
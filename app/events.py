@@ -0,0 +1,188 @@
+"""Fan committed changes out to Server-Sent Events subscribers.
+
+Every commit that writes to the change log also issues ``NOTIFY
+researchpro_changes`` on Postgres. Each worker keeps a single dedicated
+``LISTEN`` connection, watched by the event loop; a notification only
+wakes the hub, which then reads everything new from the ``changes`` table
+in commit order and hands it to the in-memory queue of every matching
+subscriber. Without Postgres the same wake-up comes from the committing
+session, which covers a single-process deployment.
+"""
+import asyncio
+import logging
+from typing import Optional, Set
+
+from sqlalchemy import event, func, select
+
+from app import metrics, models
+from app.changelog import NOTIFY_CHANNEL
+from app.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 1000
+_DRAIN_BATCH = 1000
+_RECONNECT_DELAY = 2.0
+
+SUBSCRIBERS = metrics.Gauge("researchpro_sse_subscribers", "Open change stream connections.")
+DROPPED = metrics.Counter("researchpro_sse_dropped_total", "Subscribers disconnected for falling too far behind.")
+
+
+def change_event(change: models.Change) -> dict:
+    return {
+        "id": change.id,
+        "entity": change.entity,
+        "entity_id": change.entity_id,
+        "op": change.op,
+        "topic_id": change.topic_id,
+        "changed_at": change.changed_at.isoformat(),
+    }
+
+
+class Subscriber:
+    def __init__(self, topic_id: Optional[int]):
+        self.topic_id = topic_id
+        self.queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, item: dict) -> None:
+        if self.overflowed or (self.topic_id is not None and item["topic_id"] != self.topic_id):
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # The client resumes from the change log with Last-Event-ID
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            DROPPED.inc()
+
+
+class ChangeHub:
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.last_id = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener = None
+        self._draining = False
+        self._dirty = False
+
+    async def start(self) -> None:
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.last_id = await self._loop.run_in_executor(None, _max_change_id)
+        if engine.dialect.name == "postgresql":
+            self._listen()
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._loop.remove_reader(self._listener.fileno())
+            self._listener.close()
+            self._listener = None
+        self._loop = None
+
+    def subscribe(self, topic_id: Optional[int]) -> Subscriber:
+        subscriber = Subscriber(topic_id)
+        self.subscribers.add(subscriber)
+        SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+        SUBSCRIBERS.dec()
+
+    # ── Wake-ups ──────────────────────────────────────────────────────────────
+
+    def wake_threadsafe(self) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.wake)
+
+    def wake(self) -> None:
+        if self._draining:
+            self._dirty = True
+            return
+        self._draining = True
+        self._loop.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            while True:
+                self._dirty = False
+                batch = await self._loop.run_in_executor(None, _changes_after, self.last_id)
+                for item in batch:
+                    for subscriber in tuple(self.subscribers):
+                        subscriber.offer(item)
+                if batch:
+                    self.last_id = batch[-1]["id"]
+                if len(batch) < _DRAIN_BATCH and not self._dirty:
+                    break
+        except Exception:
+            logger.exception("failed to read the change log")
+        finally:
+            self._draining = False
+
+    # ── Postgres LISTEN connection ────────────────────────────────────────────
+
+    def _listen(self) -> None:
+        try:
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            conn = engine.dialect.dbapi.connect(*cargs, **cparams)
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+        except Exception:
+            logger.exception("cannot open the LISTEN connection, retrying")
+            self._loop.call_later(_RECONNECT_DELAY, self._listen)
+            return
+        self._listener = conn
+        self._loop.add_reader(conn.fileno(), self._on_notify)
+        # Catch up on anything committed while we were not listening
+        self.wake()
+
+    def _on_notify(self) -> None:
+        conn = self._listener
+        try:
+            conn.poll()
+        except Exception:
+            logger.exception("LISTEN connection lost, reconnecting")
+            self._loop.remove_reader(conn.fileno())
+            self._listener = None
+            self._loop.call_later(_RECONNECT_DELAY, self._listen)
+            return
+        if conn.notifies:
+            conn.notifies.clear()
+            self.wake()
+
+
+def _max_change_id() -> int:
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.max(models.Change.id))).scalar() or 0
+    finally:
+        db.close()
+
+
+def _changes_after(last_id: int) -> list:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(models.Change)
+            .filter(models.Change.id > last_id)
+            .order_by(models.Change.id)
+            .limit(_DRAIN_BATCH)
+            .all()
+        )
+        return [change_event(row) for row in rows]
+    finally:
+        db.close()
+
+
+hub = ChangeHub()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_local_subscribers(session):
+    # Postgres delivers NOTIFY to this worker's listener as well
+    if session.info.pop("changes_logged", False) and engine.dialect.name != "postgresql":
+        hub.wake_threadsafe()
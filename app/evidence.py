@@ -0,0 +1,179 @@
+"""Evidence links between insights and the sources that support them.
+
+``insight_evidence`` holds one row per (insight, source) pair with an
+optional quote. Its primary key serves insight -> sources lookups and its
+``source_id`` index the reverse, so "which insights rely on this source" is
+an index scan rather than a search through free text. Insight payloads carry
+their linked sources, loaded for a whole page of insights in one query.
+
+When a linked source's credibility changes, the insights citing it are
+logged as updated in the change feed; deleting the source does the same
+through ``app.changelog``'s cascade tracking.
+
+``resolve()`` links the free-text ``evidence`` strings that predate the
+table to sources of the same topic, by URL or by the publisher and title
+words they mention. It runs once as a job on an upgraded database; strings it
+cannot place confidently are left unlinked.
+"""
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import Text, cast, delete, event, inspect, select
+from sqlalchemy.orm import Session
+
+from app import changelog, models
+from app.database import SessionLocal
+
+
+def attach_linked_sources(db: Session, insights: Iterable[models.Insight]):
+    """Set ``linked_sources`` on each insight, for all of them in one query. Returns ``insights``."""
+    insights = list(insights)
+    if not insights:
+        return insights
+    link = models.InsightEvidence
+    rows = db.execute(
+        select(link.insight_id, link.quote, models.Source.id, models.Source.title, models.Source.credibility)
+        .join(models.Source, models.Source.id == link.source_id)
+        .where(link.insight_id.in_({insight.id for insight in insights}))
+        .order_by(link.insight_id, link.created_at, link.source_id)
+    ).all()
+    linked: Dict[int, List[dict]] = {}
+    for insight_id, quote, source_id, title, credibility in rows:
+        linked.setdefault(insight_id, []).append(
+            {"source_id": source_id, "title": title, "credibility": credibility, "quote": quote}
+        )
+    for insight in insights:
+        insight.linked_sources = linked.get(insight.id, [])
+    return insights
+
+
+def unknown_sources(db: Session, links: list) -> List[int]:
+    """Source ids among ``links`` that do not exist."""
+    wanted = {link["source_id"] for link in links}
+    if not wanted:
+        return []
+    found = set(db.execute(select(models.Source.id).where(models.Source.id.in_(wanted))).scalars())
+    return sorted(wanted - found)
+
+
+def set_links(db: Session, insight_id: int, links: list) -> None:
+    """Replace the insight's evidence links with ``links`` (dicts with ``source_id`` and ``quote``)."""
+    db.execute(delete(models.InsightEvidence).where(models.InsightEvidence.insight_id == insight_id))
+    quotes = {}
+    for link in links:
+        quotes.setdefault(link["source_id"], link.get("quote"))
+    db.add_all(
+        models.InsightEvidence(insight_id=insight_id, source_id=source_id, quote=quote)
+        for source_id, quote in quotes.items()
+    )
+
+
+def record_linked_insights(session: Session, source_ids) -> None:
+    """Log the insights citing ``source_ids`` as updated."""
+    link = models.InsightEvidence
+    rows = session.execute(
+        select(models.Insight.id, models.Insight.topic_id)
+        .join(link, link.insight_id == models.Insight.id)
+        .where(link.source_id.in_(source_ids))
+        .distinct()
+    ).all()
+    changelog.record(session, "insight", [row.id for row in rows], "update", {row.id: row.topic_id for row in rows})
+
+
+def record_bulk_update(session: Session, model, ids, values: dict) -> None:
+    """Log the insights affected by a set-based UPDATE, which the flush hooks never see."""
+    if model is models.Source and "credibility" in values:
+        record_linked_insights(session, ids)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _capture_credibility_changes(session, flush_context, instances):
+    changed = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, models.Source) and obj.id is not None
+        and inspect(obj).attrs.credibility.history.has_changes()
+    ]
+    if changed:
+        record_linked_insights(session, changed)
+
+
+# ── Resolving free-text evidence ──────────────────────────────────────────────
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "into", "over", "that", "this", "are", "was",
+    "report", "survey", "study", "results", "data", "analysis", "review",
+}
+_PUBLISHER_SCORE = 3   # naming the publisher is enough on its own
+_MIN_SCORE = 3         # otherwise this many title/publication words must match
+
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return [w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if len(w) >= 3 and w not in _STOPWORDS]
+
+
+def _score(evidence: str, words: set, source: models.Source) -> int:
+    if source.url and source.url in evidence:
+        return _PUBLISHER_SCORE
+    publication = _tokens(source.publication)
+    publisher = publication[0] if publication else None
+    score = _PUBLISHER_SCORE if publisher in words else 0
+    return score + len(words & (set(_tokens(source.title)) | set(publication)) - {publisher})
+
+
+def match(evidence: str, sources: List[models.Source]) -> Optional[models.Source]:
+    """The source ``evidence`` most plausibly refers to, or None."""
+    words = set(_tokens(evidence))
+    best, best_score = None, 0
+    for source in sources:
+        score = _score(evidence, words, source)
+        if score > best_score:
+            best, best_score = source, score
+    return best if best_score >= _MIN_SCORE else None
+
+
+def needs_resolve(db: Session) -> bool:
+    if db.query(models.InsightEvidence.insight_id).first() is not None:
+        return False
+    # A JSON column keeps None as the JSON text 'null', not SQL NULL; insights default to []
+    stored = cast(models.Insight.evidence, Text)
+    return db.query(models.Insight.id).filter(stored.isnot(None), stored.notin_(("null", "[]"))).first() is not None
+
+
+def resolve(db: Session, chunk_size: int, on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """Link insights' free-text evidence to sources of the same topic. Returns the number of links added."""
+    added = 0
+    last_id = 0
+    while True:
+        insights = (
+            db.query(models.Insight)
+            .filter(models.Insight.id > last_id)
+            .order_by(models.Insight.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not insights:
+            return added
+        last_id = insights[-1].id
+        topic_ids = {insight.topic_id for insight in insights}
+        by_topic: Dict[int, List[models.Source]] = {}
+        for source in db.query(models.Source).filter(models.Source.topic_id.in_(topic_ids)).order_by(models.Source.id):
+            by_topic.setdefault(source.topic_id, []).append(source)
+        existing = set(db.execute(
+            select(models.InsightEvidence.insight_id, models.InsightEvidence.source_id)
+            .where(models.InsightEvidence.insight_id.in_([insight.id for insight in insights]))
+        ).tuples())
+        for insight in insights:
+            for text in insight.evidence or []:
+                if not isinstance(text, str):
+                    continue
+                source = match(text, by_topic.get(insight.topic_id, []))
+                if source is None or (insight.id, source.id) in existing:
+                    continue
+                existing.add((insight.id, source.id))
+                db.add(models.InsightEvidence(insight_id=insight.id, source_id=source.id, quote=text))
+                added += 1
+        if on_chunk is not None:
+            on_chunk(len(insights))
+        db.commit()
+        if len(insights) < chunk_size:
+            return added
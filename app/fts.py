@@ -0,0 +1,98 @@
+"""SQLite FTS5 full-text indexes for search.
+
+Each searchable table gets an external-content FTS5 table (``<table>_fts``)
+with the ``trigram`` tokenizer, so a quoted phrase query matches any
+case-insensitive substring of three or more characters -- the same results
+as the ``ILIKE '%q%'`` scan it replaces. Triggers keep the indexes in step
+with every write, including set-based bulk statements. Shorter queries, and
+databases other than SQLite, fall back to ``ILIKE``.
+"""
+import logging
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import column, or_, text
+from sqlalchemy.engine import Engine
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Model -> indexed text columns
+INDEXED: Dict[type, Sequence[str]] = {
+    models.Topic: ("name", "description"),
+    models.Source: ("title", "summary"),
+    models.Note: ("content",),
+    models.Insight: ("title", "content"),
+}
+
+MIN_QUERY_LENGTH = 3   # the trigram tokenizer cannot match anything shorter
+
+_installed = False
+
+
+def _ddl(table: str, columns: Sequence[str]) -> list:
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', tokenize='trigram')",
+        # Per-trigram document counts, used by app.fuzzy to pick selective trigrams
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts}_vocab USING fts5vocab({fts}, 'row')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def install(engine: Engine) -> None:
+    """Create the FTS tables and triggers if missing, indexing rows that predate them."""
+    global _installed
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for model, columns in INDEXED.items():
+            table = model.__tablename__
+            existed = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": f"{table}_fts"}
+            ).first()
+            for statement in _ddl(table, columns):
+                conn.execute(text(statement))
+            if not existed:
+                conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+                logger.info("built full-text index %s_fts", table)
+    _installed = True
+
+
+def available(db) -> bool:
+    return _installed and db.get_bind().dialect.name == "sqlite"
+
+
+def like_escape(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def phrase(q: str) -> str:
+    return '"' + q.replace('"', '""') + '"'
+
+
+def text_filter(db, model, q: str, columns: Optional[Sequence[str]] = None):
+    """Criterion matching ``model`` rows whose indexed columns (or just ``columns``) contain ``q``."""
+    columns = columns or INDEXED[model]
+    if len(q) >= MIN_QUERY_LENGTH and available(db):
+        fts = f"{model.__tablename__}_fts"
+        query = phrase(q)
+        if tuple(columns) != tuple(INDEXED[model]):
+            query = "{" + " ".join(columns) + "} : " + query
+        return model.id.in_(
+            text(f"SELECT rowid FROM {fts} WHERE {fts} MATCH :fts_query")
+            .bindparams(fts_query=query)
+            .columns(column("rowid"))
+        )
+    # Escaped, so % and _ match themselves as they do in the FTS5 phrase above
+    pattern = f"%{like_escape(q)}%"
+    return or_(*(getattr(model, name).ilike(pattern, escape="\\") for name in columns))
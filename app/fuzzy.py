@@ -0,0 +1,123 @@
+"""Typo-tolerant search by trigram similarity.
+
+A row matches when its searchable text shares at least ``threshold`` of the
+query's trigrams, so "quantam" finds "quantum" and "Lazzard" finds "Lazard".
+Candidates always come from an index; no distance is computed in Python.
+
+On Postgres this is ``pg_trgm``'s ``word_similarity`` through GIN indexes on
+every searchable column. On SQLite the FTS5 trigram indexes of ``app.fts``
+supply the candidates: a row sharing ``m`` of the query's ``n`` trigrams must
+contain at least one of any ``n - m + 1`` of them, so only the rarest
+``n - m + 1`` (by the index's own document counts) are looked up, and the
+share is then counted in SQL for those candidates alone. Other databases fall
+back to exact substring matching.
+
+Results rank by similarity times recency, where a row ``SEARCH_RECENCY_DAYS``
+old (default 365) weighs half as much as one created today.
+"""
+import math
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, column, func, literal, or_, select, text
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import Session
+
+from app import fts, models
+
+DEFAULT_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.5"))
+RECENCY_DAYS = float(os.getenv("SEARCH_RECENCY_DAYS", "365"))
+
+_LOAD_CHUNK = 5000   # ids per IN list, well under SQLite's bound-parameter limit
+
+# Models searched by /search
+SEARCHED = (models.Source, models.Note, models.Insight)
+
+
+def install(engine: Engine) -> None:
+    """Create the trigram indexes fuzzy search relies on (Postgres; SQLite uses app.fts)."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for model in SEARCHED:
+            table = model.__tablename__
+            for name in fts.INDEXED[model]:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_{name}_trgm ON {table} USING gin ({name} gin_trgm_ops)"
+                ))
+
+
+def recency(created_at: Optional[datetime], now: datetime) -> float:
+    if created_at is None:
+        return 0.5
+    age_days = max((now - created_at).total_seconds(), 0.0) / 86400
+    return 1.0 / (1.0 + age_days / RECENCY_DAYS)
+
+
+def trigrams(q: str) -> List[str]:
+    """The trigrams of each word of ``q``, as the FTS5 trigram tokenizer folds them."""
+    found = []
+    for word in q.lower().split():
+        for i in range(len(word) - 2):
+            if word[i:i + 3] not in found:
+                found.append(word[i:i + 3])
+    return found
+
+
+def _postgres(db: Session, model, q: str, threshold: float):
+    columns = [getattr(model, name) for name in fts.INDEXED[model]]
+    db.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True)))
+    # "<%" is the indexable form of word_similarity(q, column) >= threshold
+    criterion = or_(*(literal(q).op("<%")(col) for col in columns))
+    score = func.greatest(*(func.word_similarity(q, func.coalesce(col, "")) for col in columns))
+    return criterion, score
+
+
+def _sqlite(db: Session, model, q: str, threshold: float, criteria: Sequence) -> Optional[Dict[int, float]]:
+    grams = trigrams(q)
+    if not grams:
+        return None
+    fts_table = f"{model.__tablename__}_fts"
+    placeholders = ", ".join(f":t{i}" for i in range(len(grams)))
+    counts = dict(db.execute(
+        text(f"SELECT term, doc FROM {fts_table}_vocab WHERE term IN ({placeholders})"),
+        {f"t{i}": gram for i, gram in enumerate(grams)},
+    ).all())
+    needed = math.ceil(threshold * len(grams))
+    rarest = sorted(grams, key=lambda gram: counts.get(gram, 0))[: len(grams) - needed + 1]
+    candidates = (
+        text(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :fts_query")
+        .bindparams(fts_query=" OR ".join(fts.phrase(gram) for gram in rarest))
+        .columns(column("rowid"))
+    )
+    # LIKE folds ASCII case the way the trigram tokenizer does
+    columns = [getattr(model, name) for name in fts.INDEXED[model]]
+    shared = sum(
+        case((or_(*(col.like(f"%{fts.like_escape(gram)}%", escape="\\") for col in columns)), 1), else_=0)
+        for gram in grams
+    )
+    rows = db.execute(select(model.id, shared).where(model.id.in_(candidates), *criteria))
+    return {row_id: n / len(grams) for row_id, n in rows if n >= needed}
+
+
+def matches(
+    db: Session, model, q: str, columns: Sequence, threshold: float = DEFAULT_THRESHOLD, criteria: Sequence = ()
+) -> List[Tuple[Row, float]]:
+    """``columns`` (including ``model.id``) of rows similar to ``q``, each with its similarity in [0, 1]."""
+    if db.get_bind().dialect.name == "postgresql":
+        criterion, score = _postgres(db, model, q, threshold)
+        rows = db.execute(select(*columns, score.label("similarity")).where(criterion, *criteria))
+        return [(row, float(row.similarity)) for row in rows]
+    scores = _sqlite(db, model, q, threshold, criteria) if fts.available(db) else None
+    if scores is None:
+        # Nothing to compare trigrams with: no index, or no word of three letters
+        return [(row, 1.0) for row in db.execute(select(*columns).where(fts.text_filter(db, model, q), *criteria))]
+    # Scoring reads only the searched columns; the wanted columns are loaded for the matches alone
+    ids = list(scores)
+    found = []
+    for i in range(0, len(ids), _LOAD_CHUNK):
+        rows = db.execute(select(*columns).where(model.id.in_(ids[i:i + _LOAD_CHUNK]), *criteria))
+        found += [(row, scores[row.id]) for row in rows]
+    return found
@@ -0,0 +1,218 @@
+"""Idempotency keys for POST requests.
+
+A ``POST`` under the API prefix that carries an ``Idempotency-Key`` header
+runs at most once per key and API token. The first request claims the key by
+inserting a row into ``idempotency_keys`` -- the primary key makes the claim
+atomic across workers and processes -- and stores its response there when it
+completes. For ``IDEMPOTENCY_TTL_SECONDS`` (default 86400) a retry with the
+same key gets that response back, marked ``Idempotent-Replayed: true``,
+without the write being redone.
+
+* The same key with a different path, query or body is rejected with ``422``.
+* The same key while the first request is still running gets ``409`` with
+  ``Retry-After``. A claim older than ``IDEMPOTENCY_LOCK_SECONDS`` (default
+  60) is presumed abandoned by a dead worker and taken over.
+* ``5xx`` responses, and requests that fail outright, are not stored: the
+  key is released so the retry runs.
+
+Expired keys are deleted by the periodic ``purge_idempotency_keys`` job.
+"""
+import hashlib
+import json
+import math
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics, models
+from app.database import engine
+
+TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+MAX_KEY_LENGTH = 255
+
+REPLAYS = metrics.Counter(
+    "researchpro_idempotency_requests_total",
+    "POST requests carrying an Idempotency-Key, by outcome: claimed (ran), replayed, conflict "
+    "(first request still running) or mismatch (key reused for a different request).",
+    ["outcome"],
+)
+
+_table = models.IdempotencyKey.__table__
+
+# Claim outcomes
+CLAIMED, REPLAY, IN_PROGRESS, MISMATCH = "claimed", "replayed", "conflict", "mismatch"
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _fingerprint(scope, body: bytes) -> str:
+    digest = hashlib.sha256(scope["method"].encode() + b" " + scope["path"].encode())
+    digest.update(b"?" + scope.get("query_string", b""))
+    digest.update(b"\0" + (_header(scope, b"content-type") or "").encode("latin-1"))
+    digest.update(b"\0" + body)
+    return digest.hexdigest()
+
+
+def _insert_claim(conn, values: dict) -> bool:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(_table).values(**values))
+            return True
+        except IntegrityError:
+            return False
+    return conn.execute(dialect_insert(_table).values(**values).on_conflict_do_nothing()).rowcount == 1
+
+
+def claim(scope_id: str, key: str, fingerprint: str) -> Tuple[str, Optional[object]]:
+    """Claim ``key`` for a request, or say why not. Returns (outcome, stored row for REPLAY)."""
+    now = datetime.utcnow()
+    values = {
+        "scope": scope_id, "key": key, "fingerprint": fingerprint,
+        "created_at": now, "expires_at": now + timedelta(seconds=TTL_SECONDS),
+    }
+    with engine.begin() as conn:
+        if _insert_claim(conn, values):
+            return CLAIMED, None
+        where = (_table.c.scope == scope_id, _table.c.key == key)
+        row = conn.execute(select(_table).where(*where)).first()
+        if row is None:
+            # Purged between the insert and the read
+            return (CLAIMED if _insert_claim(conn, values) else IN_PROGRESS), None
+        expired = row.expires_at <= now
+        abandoned = row.status_code is None and row.created_at <= now - timedelta(seconds=LOCK_SECONDS)
+        if expired or abandoned:
+            # Conditional on what we read, so only one of several racing retries takes it over
+            taken = conn.execute(
+                update(_table)
+                .where(*where, _table.c.created_at == row.created_at)
+                .values(status_code=None, headers=None, body=None, **values)
+            ).rowcount
+            return (CLAIMED if taken else IN_PROGRESS), None
+        if row.fingerprint != fingerprint:
+            return MISMATCH, None
+        if row.status_code is None:
+            return IN_PROGRESS, None
+        return REPLAY, row
+
+
+def store(scope_id: str, key: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            update(_table)
+            .where(_table.c.scope == scope_id, _table.c.key == key)
+            .values(
+                status_code=status,
+                headers=[[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers],
+                body=body,
+            )
+        )
+
+
+def release(scope_id: str, key: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.scope == scope_id, _table.c.key == key))
+
+
+def purge(db) -> int:
+    """Delete expired keys. Returns how many."""
+    deleted = db.execute(delete(_table).where(_table.c.expires_at <= datetime.utcnow())).rowcount
+    db.commit()
+    return deleted
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: Optional[float] = None) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode()))
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, prefix: str = "/api/v1"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        key = _header(scope, b"idempotency-key") if scope["type"] == "http" else None
+        if key is None or scope["method"] != "POST" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _reject(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        # The body is part of the fingerprint, so read it all before deciding
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        token = _header(scope, b"x-api-token") or "anonymous"
+        scope_id = hashlib.sha256(token.encode()).hexdigest()[:32]
+
+        outcome, stored = await run_in_threadpool(claim, scope_id, key, _fingerprint(scope, body))
+        REPLAYS.inc((outcome,))
+        if outcome == MISMATCH:
+            await _reject(send, 422, "Idempotency-Key was already used for a different request")
+            return
+        if outcome == IN_PROGRESS:
+            await _reject(send, 409, "A request with this Idempotency-Key is still in progress", 1)
+            return
+        if outcome == REPLAY:
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored.headers]
+            headers.append((b"idempotent-replayed", b"true"))
+            await send({"type": "http.response.start", "status": stored.status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": stored.body or b""})
+            return
+
+        replayed = False
+
+        async def replay_body():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start: dict = {}
+        response: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                response.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            await run_in_threadpool(release, scope_id, key)
+            raise
+        if start and start["status"] < 500:
+            headers = list(start.get("headers", []))
+            await run_in_threadpool(store, scope_id, key, start["status"], headers, b"".join(response))
+        else:
+            await run_in_threadpool(release, scope_id, key)
@@ -0,0 +1,300 @@
+"""Write-behind buffering for high-rate note capture.
+
+``POST /notes?buffered=true`` validates the note, puts it in a bounded
+in-memory queue and answers ``202`` with a tracking id without touching the
+database. A flusher thread writes the queue out in grouped transactions of
+up to ``NOTE_BUFFER_FLUSH_ROWS`` notes (default 500), at least every
+``NOTE_BUFFER_FLUSH_MS`` (default 50). One commit, one change-log append and
+one fsync then cover hundreds of notes instead of one each. Each group is a
+single set-based INSERT, which the ORM's flush hooks never see, so it records
+its change-log entries, activity counts and suggestion terms itself. Search
+indexes need no such help: the SQLite full-text tables of ``app.fts`` follow
+through their triggers, and Postgres maintains its trigram indexes itself.
+
+* Backpressure: while ``NOTE_BUFFER_MAX_ROWS`` notes (default 10000) are
+  waiting, further buffered posts get ``503`` with ``Retry-After``.
+* A group the database rejects is split and retried, so one bad note (an
+  unknown ``topic_id``, say) fails alone. If the database is unreachable the
+  group goes back on the queue and is retried after a pause.
+* ``GET /notes/buffered/{tracking_id}`` reports ``pending``, ``failed`` or
+  ``written`` with the note id. The tracking id is stored on the note
+  (``notes.ingest_id``), so any worker can answer ``written``.
+* On shutdown the queue is flushed. Notes that cannot be written are spilled
+  to ``NOTE_BUFFER_SPILL_DIR`` and queued again at the next start, skipping
+  any already written. A spill file is deleted only once every note in it
+  has been written or rejected; one left behind by a worker that died while
+  restoring it is taken over by the next worker to start.
+
+Acknowledged notes live only in memory until their group commits, so a crash
+(as opposed to a clean shutdown) loses whatever was still queued. Clients
+that cannot accept that post without ``buffered``.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app import activity, changelog, models, suggest
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MAX_ROWS = int(os.getenv("NOTE_BUFFER_MAX_ROWS", "10000"))
+FLUSH_ROWS = int(os.getenv("NOTE_BUFFER_FLUSH_ROWS", "500"))
+FLUSH_MS = float(os.getenv("NOTE_BUFFER_FLUSH_MS", "50"))
+# Must be writable by the app user; the Docker image points this at /var/lib/researchpro
+SPILL_DIR = os.getenv("NOTE_BUFFER_SPILL_DIR", os.path.join(tempfile.gettempdir(), "researchpro-note-buffer"))
+RETRY_SECONDS = 1.0
+FAILED_KEPT = 10000   # failed tracking ids remembered for status lookups
+
+_ID_CHUNK = 5000   # ids per IN list, well under SQLite's bound-parameter limit
+_CLAIMED = re.compile(r"^(?P<path>.+\.jsonl)\.(?P<pid>\d+)\.restoring$")
+
+
+class Rejected(Exception):
+    """The buffer cannot take the note now; the client should retry later."""
+
+
+def install(engine: Engine) -> None:
+    """Add ``notes.ingest_id`` to databases created before it existed."""
+    if "ingest_id" in {col["name"] for col in inspect(engine).get_columns("notes")}:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE notes ADD COLUMN ingest_id VARCHAR(32)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_notes_ingest_id ON notes (ingest_id)"))
+
+
+class NoteBuffer:
+    def __init__(self, max_rows: int, flush_rows: int, flush_ms: float):
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_ms / 1000
+        self._cond = threading.Condition()
+        # Tracking id -> note values; insertion order is write order
+        self._pending: Dict[str, dict] = {}
+        self._inflight: Dict[str, dict] = {}
+        self._failed: "OrderedDict[str, str]" = OrderedDict()
+        # Restored spill files -> tracking ids from them not yet written or rejected
+        self._claimed: Dict[str, Set[str]] = {}
+        self._origin: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def submit(self, values: dict) -> str:
+        """Queue a note for writing. Returns its tracking id; raises ``Rejected`` when full or stopped."""
+        tracking_id = uuid.uuid4().hex
+        with self._cond:
+            if self._thread is None or self._stopping:
+                raise Rejected("Buffered note ingestion is not running")
+            if len(self._pending) >= self.max_rows:
+                raise Rejected("Note buffer is full, retry later")
+            # Stamped now, so notes keep the time they were captured rather than written
+            now = datetime.utcnow()
+            self._pending[tracking_id] = {**values, "ingest_id": tracking_id, "created_at": now, "updated_at": now}
+            # Wake the flusher to start a group, or to write a full one without waiting
+            if len(self._pending) == 1 or len(self._pending) >= self.flush_rows:
+                self._cond.notify()
+        return tracking_id
+
+    def status(self, tracking_id: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(``pending`` or ``failed``, error) for a note this process holds; None once written or if unknown."""
+        with self._cond:
+            if tracking_id in self._pending or tracking_id in self._inflight:
+                return "pending", None
+            if tracking_id in self._failed:
+                return "failed", self._failed[tracking_id]
+        return None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._restore()
+        self._thread = threading.Thread(target=self._run, name="note-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Flush what is queued, spilling to disk whatever cannot be written."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        with self._cond:
+            rows = list(self._inflight.values()) + list(self._pending.values())
+            self._inflight, self._pending = {}, {}
+            claimed, self._claimed, self._origin = list(self._claimed), {}, {}
+        if rows:
+            self._spill(rows)
+        # What the restored files still held is in the new spill file now
+        for path in claimed:
+            os.remove(path)
+
+    # ── Flushing ──────────────────────────────────────────────────────────────
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if len(self._pending) < self.flush_rows and not self._stopping:
+                    # Gather a group; a full one wakes us early
+                    self._cond.wait(self.flush_seconds)
+                if not self._pending:
+                    return
+                batch = [(tid, self._pending.pop(tid)) for tid in list(islice(self._pending, self.flush_rows))]
+                self._inflight.update(batch)
+            try:
+                self._write([row for _tid, row in batch])
+            except Exception:
+                logger.exception("note buffer: writing %d notes failed; will retry", len(batch))
+                with self._cond:
+                    # Back to the front of the queue, in order
+                    self._pending = {**self._inflight, **self._pending}
+                    self._inflight = {}
+                    if self._stopping:
+                        return
+                    self._cond.wait(RETRY_SECONDS)
+
+    def _write(self, rows: List[dict]) -> None:
+        """Write ``rows`` in one transaction, splitting the group to isolate rows the database rejects."""
+        db = SessionLocal()
+        try:
+            # Core rather than ORM, and no RETURNING: either would cost a statement per row
+            db.execute(insert(models.Note), rows)
+            written = db.execute(
+                select(models.Note.id, models.Note.topic_id)
+                .where(models.Note.ingest_id.in_([row["ingest_id"] for row in rows]))
+            ).all()
+            changelog.record(db, "note", [row.id for row in written], "create", {row.id: row.topic_id for row in written})
+            activity.record_bulk_insert(db, models.Note, rows)
+            suggest.record_bulk_insert(db, models.Note, rows)
+            db.commit()
+        except (IntegrityError, DataError) as exc:
+            db.rollback()
+            if len(rows) > 1:
+                mid = len(rows) // 2
+                self._write(rows[:mid])
+                self._write(rows[mid:])
+                return
+            self._fail(rows[0]["ingest_id"], exc)
+            return
+        finally:
+            db.close()
+        with self._cond:
+            for row in rows:
+                self._inflight.pop(row["ingest_id"], None)
+        self._settle(row["ingest_id"] for row in rows)
+
+    def _fail(self, tracking_id: str, exc: Exception) -> None:
+        logger.warning("note buffer: note %s rejected: %s", tracking_id, getattr(exc, "orig", exc))
+        with self._cond:
+            self._inflight.pop(tracking_id, None)
+            self._failed[tracking_id] = f"{type(exc).__name__}: {getattr(exc, 'orig', exc)}"
+            while len(self._failed) > FAILED_KEPT:
+                self._failed.popitem(last=False)
+        self._settle([tracking_id])
+
+    def _settle(self, tracking_ids: Iterable[str]) -> None:
+        """Delete the restored spill files whose last outstanding notes are among ``tracking_ids``."""
+        done = []
+        with self._cond:
+            if not self._origin:
+                return
+            for tracking_id in tracking_ids:
+                path = self._origin.pop(tracking_id, None)
+                if path is None:
+                    continue
+                self._claimed[path].discard(tracking_id)
+                if not self._claimed[path]:
+                    del self._claimed[path]
+                    done.append(path)
+        for path in done:
+            os.remove(path)
+
+    # ── Spilling ──────────────────────────────────────────────────────────────
+
+    def _spill(self, rows: List[dict]) -> None:
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        path = os.path.join(SPILL_DIR, f"notes-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+        with open(path, "w") as f:
+            for row in rows:
+                stamps = {name: row[name].isoformat() for name in ("created_at", "updated_at")}
+                f.write(json.dumps({**row, **stamps}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        logger.warning("note buffer: spilled %d unwritten notes to %s", len(rows), path)
+
+    @staticmethod
+    def _abandoned(claimed: str) -> bool:
+        """Whether the worker that claimed a spill file is gone, so the file is up for grabs."""
+        pid = int(_CLAIMED.match(claimed).group("pid"))
+        if pid == os.getpid():
+            # Left by an earlier process with our pid (containers reuse low pids); this one has not claimed it
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def _restore(self) -> None:
+        """Queue the notes spilled by earlier shutdowns, except those that were written after all."""
+        spilled = glob.glob(os.path.join(SPILL_DIR, "notes-*.jsonl"))
+        leftover = glob.glob(os.path.join(SPILL_DIR, "notes-*.jsonl.*.restoring"))
+        for found in sorted(spilled + [path for path in leftover if self._abandoned(path)]):
+            path = _CLAIMED.match(found).group("path") if found.endswith(".restoring") else found
+            claimed = f"{path}.{os.getpid()}.restoring"
+            try:
+                # Atomic, so of several workers starting together only one takes each file
+                os.rename(found, claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            ids = [row["ingest_id"] for row in rows]
+            written = set()
+            db = SessionLocal()
+            try:
+                for i in range(0, len(ids), _ID_CHUNK):
+                    written.update(db.execute(
+                        select(models.Note.ingest_id).where(models.Note.ingest_id.in_(ids[i:i + _ID_CHUNK]))
+                    ).scalars())
+            finally:
+                db.close()
+            queued = [row for row in rows if row["ingest_id"] not in written]
+            if not queued:
+                os.remove(claimed)
+                continue
+            with self._cond:
+                # The file stays until the flusher has written or rejected every note queued from it
+                self._claimed[claimed] = {row["ingest_id"] for row in queued}
+                for row in queued:
+                    for name in ("created_at", "updated_at"):
+                        row[name] = datetime.fromisoformat(row[name])
+                    self._pending[row["ingest_id"]] = row
+                    self._origin[row["ingest_id"]] = claimed
+            logger.info("note buffer: restored %d spilled notes from %s", len(queued), path)
+
+
+buffer = NoteBuffer(MAX_ROWS, FLUSH_ROWS, FLUSH_MS)
@@ -0,0 +1,328 @@
+"""Background jobs stored in the ``jobs`` table.
+
+Handlers run outside the request path. A worker claims the oldest queued
+job with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of workers, in
+any number of processes, can share the queue without blocking each other.
+The claiming transaction only flips the job to ``running``; the handler then
+does its work in its own short transactions and records progress in
+``done``/``total`` as it goes.
+
+``JOB_WORKERS`` threads (default 1) run inside every API process, on their
+own small connection pool so they never take connections from requests. For
+full isolation, set ``JOB_WORKERS=0`` on the API and run the workers as a
+separate process with ``python -m app.jobs``.
+
+A job whose worker died is picked up again once its heartbeat is older than
+``JOB_STALE_SECONDS``, up to ``JOB_MAX_ATTEMPTS`` attempts. Handlers must
+therefore be safe to re-run.
+
+Periodic jobs (``PERIODIC``) are queued by whichever worker finds the queue
+empty once the last job of their kind is older than its interval.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, event, or_, update
+from sqlalchemy.orm import Session
+
+from app import activity, evidence, idempotency, metrics, models, partitions, saved_searches
+from app.bulk import CHUNK_SIZE, apply_in_chunks, count_matching
+from app.database import SessionLocal, create_app_engine
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2.0"))
+STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+JOBS = metrics.Counter("researchpro_jobs_total", "Background jobs finished, by kind and outcome.", ["kind", "outcome"])
+
+Handler = Callable[[Session, models.Job], Optional[dict]]
+HANDLERS: Dict[str, Handler] = {}
+
+# Kind -> seconds between runs (0 disables)
+PERIODIC: Dict[str, float] = {
+    "evaluate_saved_searches": saved_searches.INTERVAL_SECONDS,
+    "purge_idempotency_keys": float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "3600")),
+    "maintain_partitions": partitions.INTERVAL_SECONDS,
+}
+
+
+def handler(kind: str):
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, params: dict) -> models.Job:
+    """Add a job to the caller's transaction; it becomes visible to workers when the caller commits."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = models.Job(kind=kind, params=params, status="queued", done=0, attempts=0)
+    db.add(job)
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+def schedule_backfills(db: Session) -> None:
+    """Queue the one-off jobs a database needs after an upgrade."""
+    # Rollups start empty on a database that predates them
+    if activity.needs_rebuild(db):
+        enqueue(db, "rebuild_activity", {})
+        db.commit()
+    # Evidence links start empty too; resolved once, whatever that finds
+    if evidence.needs_resolve(db) and db.query(models.Job.id).filter(models.Job.kind == "resolve_evidence").first() is None:
+        enqueue(db, "resolve_evidence", {})
+        db.commit()
+
+
+def schedule_periodic(db: Session) -> None:
+    """Queue each periodic job whose last run is older than its interval."""
+    now = datetime.utcnow()
+    for kind, interval in PERIODIC.items():
+        if interval <= 0:
+            continue
+        recent = (
+            db.query(models.Job.id)
+            .filter(
+                models.Job.kind == kind,
+                or_(
+                    models.Job.status.in_(("queued", "running")),
+                    models.Job.created_at > now - timedelta(seconds=interval),
+                ),
+            )
+            .first()
+        )
+        if recent is None:
+            enqueue(db, kind, {})
+    db.commit()
+
+
+def advance(job: models.Job, rows: int) -> None:
+    """Record progress; it is written by the handler's next commit."""
+    job.done = (job.done or 0) + rows
+    job.heartbeat_at = datetime.utcnow()
+
+
+# ── Claiming and running ──────────────────────────────────────────────────────
+
+def _claim(db: Session) -> Optional[models.Job]:
+    now = datetime.utcnow()
+    stale = and_(models.Job.status == "running", models.Job.heartbeat_at < now - timedelta(seconds=STALE_SECONDS))
+    db.execute(
+        update(models.Job)
+        .where(stale, models.Job.attempts >= MAX_ATTEMPTS)
+        .values(status="failed", error="Worker lost", finished_at=now)
+    )
+    job = (
+        db.query(models.Job)
+        .filter(or_(models.Job.status == "queued", and_(stale, models.Job.attempts < MAX_ATTEMPTS)))
+        .order_by(models.Job.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.commit()
+        return None
+    # Conditional on what we read: databases without SKIP LOCKED (SQLite) let two workers see the same row
+    claimed = db.execute(
+        update(models.Job)
+        .where(models.Job.id == job.id, models.Job.status == job.status, models.Job.attempts == job.attempts)
+        .values(status="running", attempts=job.attempts + 1, started_at=now, heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return job if claimed else None
+
+
+def _finish(db: Session, job: models.Job, status: str, result=None, error: Optional[str] = None) -> None:
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    JOBS.inc((job.kind, status))
+
+
+def run_next(bind=None) -> bool:
+    """Claim and run one job. Returns False when the queue is empty."""
+    db = SessionLocal(bind=bind) if bind is not None else SessionLocal()
+    try:
+        job = _claim(db)
+        if job is None:
+            return False
+        try:
+            fn = HANDLERS.get(job.kind)
+            if fn is None:
+                raise LookupError(f"Unknown job kind: {job.kind}")
+            result = fn(db, job)
+        except Exception as exc:
+            logger.exception("job %s (%s) failed", job.id, job.kind)
+            db.rollback()
+            _finish(db, job, "failed", error=f"{type(exc).__name__}: {exc}")
+        else:
+            _finish(db, job, "succeeded", result=result)
+        return True
+    finally:
+        db.close()
+
+
+class JobRunner:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._engine = None
+
+    def start(self) -> None:
+        if self._threads or self.workers <= 0:
+            return
+        self._stopping.clear()
+        self._engine = create_app_engine(pool_size=self.workers, max_overflow=0)
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                ran = run_next(self._engine)
+                if not ran:
+                    _schedule_periodic(self._engine)
+            except Exception:
+                logger.exception("job worker error")
+                ran = False
+            if not ran:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+
+
+def _schedule_periodic(bind) -> None:
+    db = SessionLocal(bind=bind)
+    try:
+        schedule_periodic(db)
+    finally:
+        db.close()
+
+
+runner = JobRunner(WORKERS)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False):
+        runner.wake()
+
+
+# ── Handlers ──────────────────────────────────────────────────────────────────
+
+@handler("delete_topic")
+def _delete_topic(db: Session, job: models.Job) -> dict:
+    """Detach the topic's sources and notes and delete its insights in chunks, then the topic itself."""
+    topic_id = job.params["topic_id"]
+    topic = db.get(models.Topic, topic_id)
+    if topic is None:
+        return {"topic_id": topic_id, "deleted": False}
+    job.total = 1 + sum(
+        count_matching(db, model, [model.topic_id == topic_id])
+        for model in (models.Source, models.Note, models.Insight)
+    )
+    db.commit()
+
+    def on_chunk(rows):
+        advance(job, rows)
+
+    result = {
+        "topic_id": topic_id,
+        "deleted": True,
+        "sources_detached": apply_in_chunks(
+            db, models.Source, [models.Source.topic_id == topic_id], {"topic_id": None}, on_chunk),
+        "notes_detached": apply_in_chunks(
+            db, models.Note, [models.Note.topic_id == topic_id], {"topic_id": None}, on_chunk),
+        "insights_deleted": apply_in_chunks(
+            db, models.Insight, [models.Insight.topic_id == topic_id], None, on_chunk),
+    }
+    # Rows attached since the sweep are handled by the database's ON DELETE rules
+    topic = db.get(models.Topic, topic_id)
+    if topic is not None:
+        db.delete(topic)
+    advance(job, 1)
+    db.commit()
+    return result
+
+
+@handler("rebuild_activity")
+def _rebuild_activity(db: Session, job: models.Job) -> dict:
+    return {"rollup_rows": activity.rebuild(db)}
+
+
+@handler("resolve_evidence")
+def _resolve_evidence(db: Session, job: models.Job) -> dict:
+    """Link the free-text evidence of existing insights to sources."""
+    job.total = count_matching(db, models.Insight, [])
+    db.commit()
+    return {"links_added": evidence.resolve(db, CHUNK_SIZE, lambda rows: advance(job, rows))}
+
+
+@handler("evaluate_saved_searches")
+def _evaluate_saved_searches(db: Session, job: models.Job) -> dict:
+    """Record new hits of every saved search since its last evaluation."""
+    job.total = db.query(models.SavedSearch.id).count()
+    db.commit()
+    return saved_searches.evaluate(db, lambda searches: advance(job, searches))
+
+
+@handler("purge_idempotency_keys")
+def _purge_idempotency_keys(db: Session, job: models.Job) -> dict:
+    return {"deleted": idempotency.purge(db)}
+
+
+@handler("maintain_partitions")
+def _maintain_partitions(db: Session, job: models.Job) -> dict:
+    # On the session's own connection: the worker pool has one per worker
+    result = partitions.maintain(db.connection())
+    db.commit()
+    return result
+
+
+if __name__ == "__main__":
+    import signal
+
+    from app import ingest, versioning
+    from app.database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    models.Base.metadata.create_all(bind=engine)
+    versioning.install(engine)
+    ingest.install(engine)
+    partitions.install(engine)
+    runner.workers = max(WORKERS, 1)
+    done = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: done.set())
+    runner.start()
+    logger.info("running %d job worker(s)", runner.workers)
+    try:
+        done.wait()
+    except KeyboardInterrupt:
+        pass
+    runner.stop()
@@ -1,14 +1,24 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func as sqlfunc
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.database import engine, SessionLocal, get_db
-from app import models
+from app import events, fts, fuzzy, ingest, metrics, models, partitions, suggest, versioning
+from app.coalesce import CoalescingMiddleware
+from app.encoding import CompressionMiddleware, MsgPackMiddleware
+from app.idempotency import IdempotencyMiddleware
+from app.jobs import runner as job_runner, schedule_backfills
+from app.ratelimit import AdmissionMiddleware
+from app.tracing import QueryTracingMiddleware
 from app.models import Topic, Source, Note, Insight, Collection
 from app.seed import seed
-from app.routers import topics, sources, notes, insights, collections, search, dashboard
+from app import changelog  # noqa: F401  (registers the change capture hooks)
+from app.routers import (
+    topics, sources, notes, insights, collections, search, saved_searches, dashboard, changes, stream, jobs, activity,
+)
 
 API_PREFIX = "/api/v1"
 
@@ -17,13 +27,26 @@ API_PREFIX = "/api/v1"
 async def lifespan(app: FastAPI):
     # Create all tables on startup
     models.Base.metadata.create_all(bind=engine)
+    versioning.install(engine)
+    ingest.install(engine)
+    partitions.install(engine)
+    fts.install(engine)
+    suggest.install(engine)
+    fuzzy.install(engine)
     # Seed sample data
     db = SessionLocal()
     try:
         seed(db)
+        schedule_backfills(db)
     finally:
         db.close()
+    job_runner.start()
+    ingest.buffer.start()
     yield
+    # Write out buffered notes, or spill them to disk, before the process goes
+    ingest.buffer.stop()
+    job_runner.stop()
+    await events.hub.stop()
 
 
 app = FastAPI(
@@ -39,6 +62,26 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Innermost: stores and replays the plain JSON response, encoded afresh for each retry
+app.add_middleware(IdempotencyMiddleware, prefix=API_PREFIX)
+app.add_middleware(MsgPackMiddleware, prefix=API_PREFIX)
+app.add_middleware(AdmissionMiddleware, prefix=API_PREFIX)
+# Inside coalescing, so a shared response is compressed once rather than per follower
+app.add_middleware(CompressionMiddleware)
+# Coalesced followers never reach admission control: they cost no DB slot
+app.add_middleware(CoalescingMiddleware, paths=["/", f"{API_PREFIX}/dashboard", f"{API_PREFIX}/search"])
+app.add_middleware(QueryTracingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    # Another writer changed or deleted the row between our read and our write (app.versioning)
+    return JSONResponse(
+        status_code=412,
+        content={"detail": "Precondition failed: the resource was changed by another request"},
+    )
+
 from viv_auth import init_auth
 User, require_auth = init_auth(app, engine, models.Base, get_db, app_name="Research Pro")
 
@@ -114,6 +157,13 @@ def health():
     return JSONResponse({"status": "ok"})
 
 
+# ── Prometheus metrics (no auth) ──────────────────────────────────────────────
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # ── Versioned routers ─────────────────────────────────────────────────────────
 
 app.include_router(topics.router,      prefix=API_PREFIX)
@@ -122,4 +172,9 @@ app.include_router(notes.router,       prefix=API_PREFIX)
 app.include_router(insights.router,    prefix=API_PREFIX)
 app.include_router(collections.router, prefix=API_PREFIX)
 app.include_router(search.router,      prefix=API_PREFIX)
+app.include_router(saved_searches.router, prefix=API_PREFIX)
 app.include_router(dashboard.router,   prefix=API_PREFIX)
+app.include_router(changes.router,     prefix=API_PREFIX)
+app.include_router(stream.router,      prefix=API_PREFIX)
+app.include_router(jobs.router,        prefix=API_PREFIX)
+app.include_router(activity.router,    prefix=API_PREFIX)
@@ -0,0 +1,83 @@
+"""Search hits: exact or fuzzy text matches narrowed by drill-down filters.
+
+Shared by ``GET /search`` and saved searches (``app.saved_searches``). Hit
+rows carry only what ranking, listing and facets need; body text is read
+afterwards, for the page actually returned, by ``fill_text``.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app import fuzzy, models, snippets
+from app.fts import text_filter
+
+# Result type -> (model, title column, body column, facet columns)
+SEARCHED = {
+    "source": (models.Source, "title", "summary", ("credibility",)),
+    "note": (models.Note, None, "content", ()),
+    "insight": (models.Insight, "title", "content", ("status",)),
+}
+FACETS = ("result_type", "topic_id", "credibility", "status")
+
+
+def applies(result_type: str, filters: dict) -> bool:
+    """Whether hits of ``result_type`` can pass ``filters`` at all.
+
+    A filter on a facet a type lacks (credibility for notes, say) leaves no
+    hits of that type.
+    """
+    if filters.get("result_type") not in (None, result_type):
+        return False
+    facet_columns = SEARCHED[result_type][3]
+    return all(filters.get(name) is None or name in facet_columns for name in ("credibility", "status"))
+
+
+def hits(
+    db: Session,
+    result_type: str,
+    q: str,
+    mode: str = "exact",
+    threshold: float = fuzzy.DEFAULT_THRESHOLD,
+    filters: Optional[dict] = None,
+    ids: Optional[Sequence[int]] = None,
+) -> List[Tuple[Row, Optional[float]]]:
+    """Rows of ``result_type`` matching ``q`` and ``filters``, each with its fuzzy similarity (None when exact).
+
+    Each row has ``id``, ``topic_id``, ``created_at``, the type's facet columns
+    and, for titled types, ``title``. ``ids`` restricts the search to those rows.
+    """
+    filters = filters or {}
+    if not applies(result_type, filters):
+        return []
+    model, title, _body, facet_columns = SEARCHED[result_type]
+    columns = [model.id, model.topic_id, model.created_at]
+    columns += [getattr(model, name).label(name) for name in facet_columns]
+    if title:
+        columns.append(getattr(model, title).label("title"))
+    criteria = [getattr(model, name) == filters[name] for name in facet_columns if filters.get(name) is not None]
+    if filters.get("topic_id") is not None:
+        criteria.append(model.topic_id == filters["topic_id"])
+    if ids is not None:
+        criteria.append(model.id.in_(ids))
+    if mode == "fuzzy":
+        return fuzzy.matches(db, model, q, columns, threshold, criteria)
+    return [(row, None) for row in db.execute(select(*columns).where(text_filter(db, model, q), *criteria))]
+
+
+def fill_text(db: Session, results: Iterable, q: str, full_content: bool, threshold: Optional[float] = None) -> None:
+    """Set ``content`` (full text) or ``snippet`` on each of ``results``, one query per result type.
+
+    ``threshold`` highlights fuzzy matches in snippets; without it, exact ones.
+    """
+    results = list(results)
+    for result_type, (model, _title, body, _facet_columns) in SEARCHED.items():
+        page = {r.id: r for r in results if r.result_type == result_type}
+        if not page:
+            continue
+        for row_id, text in db.execute(select(model.id, getattr(model, body)).where(model.id.in_(page))):
+            if full_content:
+                page[row_id].content = text
+            else:
+                page[row_id].snippet = snippets.snippet(text, q, threshold)
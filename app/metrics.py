@@ -0,0 +1,245 @@
+"""In-process Prometheus metrics and the HTTP middleware that feeds them.
+
+Metrics are updated from the event loop and from the job worker threads, so
+each metric guards its values with a lock, held only for one update or for
+copying the values out to render them. With several uvicorn workers set
+``METRICS_MULTIPROC_DIR`` to a directory shared by all of them: each worker periodically writes its own snapshot there and ``/metrics``
+merges the snapshots of every worker, whichever worker answers the scrape.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.database import query_log_context
+
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REGISTRY: Dict[str, "Metric"] = {}
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, object] = {}
+        self.lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def copy(self) -> Dict[Labels, object]:
+        with self.lock:
+            return {k: list(v) if isinstance(v, list) else v for k, v in self.values.items()}
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, labels: Labels, value: float) -> None:
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels: Labels, value: float) -> None:
+        # [count per bucket..., count above the last bucket, sum]
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bucket] += 1
+            state[-1] += value
+
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "researchpro_http_requests_in_flight", "Requests currently being handled.", ["method"])
+REQUESTS_TOTAL = Counter(
+    "researchpro_http_requests_total", "Requests handled, by response status.", ["method", "route", "status"])
+REQUEST_DURATION = Histogram(
+    "researchpro_http_request_duration_seconds", "Time to produce the full response.", ["method", "route"])
+RESPONSE_SIZE = Histogram(
+    "researchpro_http_response_size_bytes", "Response body size.", ["method", "route"], SIZE_BUCKETS)
+DB_TIME = Histogram(
+    "researchpro_db_time_seconds", "Time spent executing SQL per request.", ["method", "route"])
+DB_QUERIES = Histogram(
+    "researchpro_db_queries_per_request", "SQL statements issued per request.", ["method", "route"], QUERY_BUCKETS)
+
+
+def route_label(scope) -> str:
+    # Template path of the matched route; unmatched paths share one label so
+    # that scanners probing random URLs cannot blow up series cardinality.
+    # Newer FastAPI releases keep included routes router-relative and record
+    # the prefixed path in an effective route context instead.
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    route = effective if effective is not None else scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._last_flush = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with query_log_context() as queries:
+            await self._handle(scope, receive, send, queries)
+
+    async def _handle(self, scope, receive, send, queries):
+        method = scope["method"]
+        status_code = 500
+        size = 0
+        # The route is only known once routing has happened, so in-flight
+        # requests are tracked per method
+        REQUESTS_IN_FLIGHT.inc((method,))
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec((method,))
+            labels = (method, route_label(scope))
+            REQUESTS_TOTAL.inc(labels + (str(status_code),))
+            REQUEST_DURATION.observe(labels, elapsed)
+            RESPONSE_SIZE.observe(labels, size)
+            DB_TIME.observe(labels, queries.duration)
+            DB_QUERIES.observe(labels, queries.count)
+            if MULTIPROC_DIR and started - self._last_flush > FLUSH_INTERVAL:
+                self._last_flush = started
+                write_snapshot()
+
+
+# ── Multi-worker aggregation ──────────────────────────────────────────────────
+
+def _snapshot() -> dict:
+    return {name: [[list(k), v] for k, v in m.copy().items()] for name, m in REGISTRY.items()}
+
+
+def write_snapshot() -> None:
+    path = os.path.join(MULTIPROC_DIR, f"metrics-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged_values() -> Dict[str, Dict[Labels, object]]:
+    if not MULTIPROC_DIR:
+        return {name: m.copy() for name, m in REGISTRY.items()}
+    write_snapshot()
+    merged: Dict[str, Dict[Labels, object]] = {name: {} for name in REGISTRY}
+    for filename in os.listdir(MULTIPROC_DIR):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(MULTIPROC_DIR, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Counters and histograms of exited workers still count towards the
+        # totals; their gauges no longer describe anything live.
+        alive = _pid_alive(int(filename[len("metrics-"):-len(".json")]))
+        for name, series in snapshot.items():
+            metric = REGISTRY.get(name)
+            if metric is None or (metric.type == "gauge" and not alive):
+                continue
+            target = merged[name]
+            for labels, value in series:
+                key = tuple(labels)
+                if metric.type == "histogram":
+                    current = target.get(key)
+                    target[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+# ── Exposition ────────────────────────────────────────────────────────────────
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Tuple[str, ...], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render() -> str:
+    lines: List[str] = []
+    for name, values in _merged_values().items():
+        metric = REGISTRY[name]
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        for labels, value in sorted(values.items()):
+            if metric.type != "histogram":
+                lines.append(f"{name}{_labels(metric.labelnames, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(metric.labelnames, labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {value[-1]}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
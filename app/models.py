@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, BigInteger, Integer, Float, String, Text, DateTime, Date, Boolean, ForeignKey, Index, JSON, LargeBinary
 from app.database import Base
 
 
@@ -15,6 +15,9 @@ class Topic(Base):
     tags = Column(JSON, default=list)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)    # see app.versioning
+
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Source(Base):
@@ -34,6 +37,9 @@ class Source(Base):
     added_by = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)    # see app.versioning
+
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Note(Base):
@@ -47,6 +53,11 @@ class Note(Base):
     tags = Column(JSON, default=list)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)    # see app.versioning
+    ingest_id = Column(String(32), index=True)    # tracking id of a buffered post, see app.ingest
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}    # see app.partitions
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Insight(Base):
@@ -63,6 +74,20 @@ class Insight(Base):
     author = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)    # see app.versioning
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}    # see app.partitions
+    __mapper_args__ = {"version_id_col": version}
+
+
+class InsightEvidence(Base):
+    __tablename__ = "insight_evidence"
+
+    # The primary key serves insight -> sources lookups, the source_id index the reverse
+    insight_id = Column(Integer, ForeignKey("insights.id", ondelete="CASCADE"), primary_key=True)
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), primary_key=True, index=True)
+    quote = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Collection(Base):
@@ -77,3 +102,93 @@ class Collection(Base):
     shared = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)    # see app.versioning
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class SavedSearch(Base):
+    __tablename__ = "saved_searches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    owner = Column(String(255), index=True)
+    q = Column(String(500), nullable=False)
+    mode = Column(String(10), default="exact")          # exact / fuzzy
+    threshold = Column(Float, nullable=True)            # fuzzy mode; None for the server default
+    filters = Column(JSON, default=dict)                # result_type / topic_id / credibility / status
+    # Id of the last change-log entry evaluated against (see app.saved_searches)
+    last_change_id = Column(BigInteger, nullable=False, default=0)
+    last_run_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)    # see app.versioning
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class SavedSearchHit(Base):
+    __tablename__ = "saved_search_hits"
+    # Serves "hits of this search after token N" in id order
+    __table_args__ = (Index("ix_saved_search_hits_search_id", "saved_search_id", "id"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    saved_search_id = Column(Integer, ForeignKey("saved_searches.id", ondelete="CASCADE"), nullable=False)
+    result_type = Column(String(20), nullable=False)    # source / note / insight
+    entity_id = Column(Integer, nullable=False)
+    found_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Change(Base):
+    __tablename__ = "changes"
+
+    # Assigned at commit time, so ids follow commit order (see app.changelog)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    entity = Column(String(20), nullable=False)         # topic/source/note/insight/collection
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)             # create / update / delete
+    topic_id = Column(Integer, nullable=True, index=True)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    params = Column(JSON, default=dict)
+    status = Column(String(20), default="queued", index=True)   # queued / running / succeeded / failed
+    done = Column(Integer, default=0)
+    total = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Maintained by app.idempotency; scope is a hash of the API token
+    scope = Column(String(32), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)    # sha256 of method, path, query and body
+    status_code = Column(Integer, nullable=True)        # None while the first request runs
+    headers = Column(JSON, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class ActivityRollup(Base):
+    __tablename__ = "activity_rollups"
+
+    # Maintained by app.activity; topic_id 0 and author "" stand for "none"
+    day = Column(Date, primary_key=True)
+    topic_id = Column(Integer, primary_key=True, default=0)
+    author = Column(String(255), primary_key=True, default="")
+    metric = Column(String(30), primary_key=True)   # sources_added / notes_written / insights_validated
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,366 @@
+"""Monthly range partitions of ``notes`` and ``insights`` on Postgres.
+
+Both tables are declared ``PARTITION BY RANGE (created_at)``. Postgres wants
+the partition key in every unique constraint, so on Postgres their primary
+key is ``(id, created_at)``; ids still come from one sequence, and the ORM
+still identifies rows by ``id`` alone. A foreign key has to reference a
+unique constraint, so ``insight_evidence`` cannot reference partitioned
+``insights``: a row trigger on ``insights`` deletes an insight's evidence
+links instead, as the ``ON DELETE CASCADE`` it replaces did. SQLite ignores
+all of this.
+
+``maintain()`` runs at startup and then as the periodic
+``maintain_partitions`` job (every ``PARTITION_MAINTENANCE_SECONDS``,
+default 86400). It creates the partitions for this month and the next
+``PARTITION_MONTHS_AHEAD`` (default 3) ahead of the rows that need them; a
+``DEFAULT`` partition catches anything outside them. It also tiers each
+partition's ``created_at`` index. Partitions within
+``PARTITION_BRIN_AFTER_DAYS`` (default 90) of now keep a B-tree, which
+serves the ``ORDER BY created_at DESC`` of every list. Older, cold
+partitions get a BRIN index, a few pages instead of a B-tree the size of the
+data, which is enough for the date-range scans that still reach them.
+``created_after``/``created_before`` on the list endpoints let the planner
+prune partitions outside the range.
+
+Old partitions can be moved out of the live tables to an archive tier and
+back:
+
+    python -m app.partitions migrate                 # partition tables created before partitioning
+    python -m app.partitions archive --before 2025-01-01
+    python -m app.partitions restore notes_p202401
+
+``archive`` detaches every partition that ends on or before the date and
+moves it to the ``PARTITION_ARCHIVE_SCHEMA`` schema (default ``archive``).
+Its rows are kept but no longer served: lists and search stop seeing them,
+as if deleted, without a row being rewritten. The change log records a
+delete for each, ``BULK_CHUNK_SIZE`` rows per transaction before the
+partition is detached, so an interrupted run can simply be repeated; the
+evidence links of archived insights are deleted, as deleting the insights
+would. ``restore`` logs the rows as created again, once they are attached;
+their evidence links do not come back.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateTable, PrimaryKeyConstraint
+
+from app import changelog, models
+from app.bulk import CHUNK_SIZE
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED = (models.Note, models.Insight)
+KEY = "created_at"
+
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+BRIN_AFTER_DAYS = float(os.getenv("PARTITION_BRIN_AFTER_DAYS", "90"))
+INTERVAL_SECONDS = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", "86400"))
+ARCHIVE_SCHEMA = os.getenv("PARTITION_ARCHIVE_SCHEMA", "archive")
+
+_TABLES = {model.__tablename__: model for model in PARTITIONED}
+
+
+# ── DDL ───────────────────────────────────────────────────────────────────────
+
+@compiles(CreateTable, "postgresql")
+def _create_table(create, compiler, **kw):
+    table = create.element
+    # Foreign keys cannot reference a partitioned table's id alone; see _install_cascades
+    dropped = [fk for fk in table.foreign_key_constraints if fk.referred_table.name in _TABLES]
+    if dropped:
+        included = create.include_foreign_key_constraints
+        if included is None:
+            included = table.foreign_key_constraints
+        create = CreateTable(
+            table, include_foreign_key_constraints=[fk for fk in included if fk not in dropped]
+        )
+    return compiler.visit_create_table(create, **kw)
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _primary_key(constraint, compiler, **kw):
+    # The Table keeps ``id`` alone as its key, for the ORM and SQLite's rowid;
+    # Postgres also needs the partition key in it
+    table = constraint.table
+    if table.name not in _TABLES or KEY in constraint.columns:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    columns = [*constraint.columns, table.c[KEY]]
+    sql = ""
+    if constraint.name is not None:
+        sql += f"CONSTRAINT {compiler.preparer.format_constraint(constraint)} "
+    sql += f"PRIMARY KEY ({', '.join(compiler.preparer.quote(column.name) for column in columns)})"
+    return sql + compiler.define_constraint_deferrability(constraint)
+
+
+def _cascades() -> Iterator[Tuple[str, str, str]]:
+    """(partitioned table, referencing table, referencing column) for each ``ON DELETE CASCADE`` left out above."""
+    for table in models.Base.metadata.sorted_tables:
+        for fk in table.foreign_key_constraints:
+            if fk.referred_table.name in _TABLES and (fk.ondelete or "").upper() == "CASCADE":
+                yield fk.referred_table.name, table.name, fk.column_keys[0]
+
+
+def _install_cascades(conn: Connection) -> None:
+    for parent, child, column in _cascades():
+        function = f"{child}_cascade_{parent}"
+        conn.execute(text(
+            f"CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$ "
+            f"BEGIN DELETE FROM {child} WHERE {column} = OLD.id; RETURN NULL; END $$"
+        ))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {function} ON {parent}"))
+        conn.execute(text(
+            f"CREATE TRIGGER {function} AFTER DELETE ON {parent} FOR EACH ROW EXECUTE FUNCTION {function}()"
+        ))
+
+
+# ── Partitions ────────────────────────────────────────────────────────────────
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _is_partitioned(conn: Connection, table: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).first() is not None
+
+
+def _partitions(conn: Connection, table: str) -> Dict[date, str]:
+    """Month -> name of the monthly partitions attached to ``table``."""
+    pattern = re.compile(rf"^{table}_p(\d{{4}})(\d{{2}})$")
+    found = {}
+    for (name,) in conn.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = to_regclass(:table)"),
+        {"table": table},
+    ):
+        match = pattern.match(name)
+        if match:
+            found[date(int(match[1]), int(match[2]), 1)] = name
+    return found
+
+
+def _create_partition(conn: Connection, table: str, month: date) -> bool:
+    """Create the partition of ``table`` for ``month``. False when rows in the default partition block it."""
+    name = partition_name(table, month)
+    try:
+        with conn.begin_nested():
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+    except Exception as exc:
+        logger.warning("partitions: cannot create %s: %s", name, getattr(exc, "orig", exc))
+        return False
+    return True
+
+
+def _tier_indexes(conn: Connection, name: str, month: date, now: datetime) -> None:
+    if _next_month(month) <= (now - timedelta(days=BRIN_AFTER_DAYS)).date():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_{KEY}_brin ON {name} USING brin ({KEY})"))
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}_{KEY}_btree"))
+    else:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_{KEY}_btree ON {name} ({KEY})"))
+
+
+def maintain(conn: Connection, now: Optional[datetime] = None) -> dict:
+    """Create upcoming partitions and tier the indexes of existing ones. A no-op off Postgres."""
+    if conn.dialect.name != "postgresql":
+        return {"created": 0}
+    now = now or datetime.utcnow()
+    created = 0
+    for model in PARTITIONED:
+        table = model.__tablename__
+        if not _is_partitioned(conn, table):
+            continue
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        existing = _partitions(conn, table)
+        month = _month_start(now.date())
+        for _ in range(MONTHS_AHEAD + 1):
+            if month not in existing and _create_partition(conn, table, month):
+                existing[month] = partition_name(table, month)
+                created += 1
+            month = _next_month(month)
+        for month, name in existing.items():
+            _tier_indexes(conn, name, month, now)
+    return {"created": created}
+
+
+def install(engine: Engine) -> None:
+    """Set up the evidence cascades and this month's partitions; warn about tables still unpartitioned."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in sorted(_TABLES):
+            if not _is_partitioned(conn, table):
+                logger.warning("partitions: %s is not partitioned; run `python -m app.partitions migrate`", table)
+        if _is_partitioned(conn, models.Insight.__tablename__):
+            _install_cascades(conn)
+        maintain(conn)
+
+
+# ── Migration and archival ────────────────────────────────────────────────────
+
+def migrate(engine: Engine) -> List[str]:
+    """Rebuild unpartitioned ``notes``/``insights`` tables as partitioned ones, copying every row.
+
+    Runs in one transaction that holds an exclusive lock on each table while
+    it copies, so run it during a maintenance window.
+    """
+    migrated = []
+    with engine.begin() as conn:
+        for model in PARTITIONED:
+            table = model.__table__
+            if _is_partitioned(conn, table.name):
+                continue
+            old = f"{table.name}_unpartitioned"
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+            # Free the names the new table's sequence and indexes take
+            conn.execute(text(f"ALTER SEQUENCE IF EXISTS {table.name}_id_seq RENAME TO {old}_id_seq"))
+            for (index,) in conn.execute(
+                text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t"),
+                {"t": old},
+            ).all():
+                conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index[:48]}_unpartitioned"'))
+            table.create(conn)
+            # The partition key cannot be NULL
+            created = f"COALESCE({KEY}, updated_at, timezone('utc', now()))"
+            months = conn.execute(text(f"SELECT DISTINCT date_trunc('month', {created}) FROM {old}")).scalars().all()
+            for month in months:
+                _create_partition(conn, table.name, month.date())
+            columns = [column.name for column in table.columns]
+            selected = [created if name == KEY else name for name in columns]
+            conn.execute(text(
+                f"INSERT INTO {table.name} ({', '.join(columns)}) SELECT {', '.join(selected)} FROM {old}"
+            ))
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT max(id) FROM {table.name}), 0) + 1, false)"
+            ))
+            # CASCADE takes the foreign keys that referenced the old table with it
+            conn.execute(text(f"DROP TABLE {old} CASCADE"))
+            migrated.append(table.name)
+        if migrated:
+            _install_cascades(conn)
+            maintain(conn)
+    return migrated
+
+
+def _log_rows(engine: Engine, model, name: str, op: str) -> None:
+    """Log every row of partition ``name`` in the change log as ``op``, ``BULK_CHUNK_SIZE`` rows per transaction."""
+    last_id = 0
+    while True:
+        db = SessionLocal(bind=engine)
+        try:
+            rows = db.execute(
+                text(f"SELECT id, topic_id FROM {name} WHERE id > :last_id ORDER BY id LIMIT :n"),
+                {"last_id": last_id, "n": CHUNK_SIZE},
+            ).all()
+            if not rows:
+                return
+            changelog.record(db, changelog.ENTITIES[model], [row.id for row in rows], op, dict(rows))
+            db.commit()
+        finally:
+            db.close()
+        last_id = rows[-1].id
+
+
+def archive(engine: Engine, before: date) -> List[str]:
+    """Detach the monthly partitions ending on or before ``before`` into the archive schema."""
+    with engine.connect() as conn:
+        due = [
+            (model, name)
+            for model in PARTITIONED
+            for month, name in sorted(_partitions(conn, model.__tablename__).items())
+            if _next_month(month) <= before
+        ]
+    archived = []
+    for model, name in due:
+        table = model.__tablename__
+        # Logged while the rows are still live, so an interrupted run can just be repeated
+        _log_rows(engine, model, name, "delete")
+        with engine.begin() as conn:
+            # Detaching deletes no rows, so the cascade triggers would not fire
+            for parent, child, column in _cascades():
+                if parent == table:
+                    conn.execute(text(f"DELETE FROM {child} WHERE {column} IN (SELECT id FROM {name})"))
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        archived.append(name)
+    return archived
+
+
+def restore(engine: Engine, name: str) -> None:
+    """Attach an archived partition to its table again."""
+    match = re.match(r"^(\w+)_p(\d{4})(\d{2})$", name)
+    if not match or match[1] not in _TABLES:
+        raise ValueError(f"Not a monthly partition of {', '.join(sorted(_TABLES))}: {name}")
+    table, month = match[1], date(int(match[2]), int(match[3]), 1)
+    with engine.begin() as conn:
+        schema = conn.execute(text("SELECT current_schema()")).scalar()
+        conn.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} SET SCHEMA {schema}"))
+        conn.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+        _tier_indexes(conn, name, month, datetime.utcnow())
+    _log_rows(engine, _TABLES[table], name, "create")
+
+
+def main(argv=None) -> int:
+    from app import fuzzy, ingest, suggest, versioning
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(description="Manage the notes and insights partitions (Postgres).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="partition tables created before partitioning")
+    commands.add_parser("maintain", help="create upcoming partitions and tier indexes now")
+    archive_cmd = commands.add_parser("archive", help="detach old partitions into the archive schema")
+    archive_cmd.add_argument("--before", type=date.fromisoformat, required=True, help="YYYY-MM-DD, exclusive")
+    restore_cmd = commands.add_parser("restore", help="re-attach an archived partition")
+    restore_cmd.add_argument("name", help="e.g. notes_p202401")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    if engine.dialect.name != "postgresql":
+        print("Partitioning needs Postgres; nothing to do on", engine.dialect.name)
+        return 1
+    if args.command == "migrate":
+        # Bring the old tables up to the current columns before copying them
+        versioning.install(engine)
+        ingest.install(engine)
+        print("migrated:", ", ".join(migrate(engine)) or "nothing")
+        # The search indexes went with the old tables
+        fuzzy.install(engine)
+        suggest.install(engine)
+    elif args.command == "maintain":
+        with engine.begin() as conn:
+            print(maintain(conn))
+    elif args.command == "archive":
+        print("archived:", ", ".join(archive(engine, args.before)) or "nothing")
+    else:
+        restore(engine, args.name)
+        print("restored:", args.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
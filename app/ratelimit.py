@@ -0,0 +1,209 @@
+"""Admission control: per-token rate limiting and a global concurrency cap.
+
+Every ``/api/v1`` request is charged to a token bucket keyed by its API token
+and route class (``read``, ``write`` or ``heavy``); an empty bucket answers
+``429``. Independently, at most ``MAX_CONCURRENT_REQUESTS`` requests run at
+once -- by default the size of the DB connection pool (``DB_POOL_SIZE`` plus
+``DB_MAX_OVERFLOW``), so excess load waits here instead of inside the pool.
+Requests that cannot get a slot within ``ADMISSION_QUEUE_TIMEOUT`` seconds,
+or that find the queue full, get ``503``.
+
+Limits are ``<tokens per second>/<burst>`` strings, e.g.
+``RATE_LIMIT_HEAVY=2/5``, or ``off``; a rate of 0 or a burst under 1 is
+refused at startup. Buckets live in process memory; set
+``RATE_LIMIT_REDIS_URL`` to share them between workers (requires ``redis``).
+"""
+import asyncio
+import hashlib
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.pool import QueuePool
+
+from app import metrics
+from app.database import DB_MAX_OVERFLOW, engine
+
+DEFAULT_LIMITS = {"read": "50/100", "write": "20/40", "heavy": "5/10"}
+
+# Paths (relative to the API prefix) whose requests run the expensive query sets
+HEAVY_PATHS = ("/search", "/dashboard")
+
+# Long-lived streams are rate limited on connect but never hold an execution slot
+STREAMING_PATHS = ("/stream",)
+
+# Served without touching the database, so never queued behind it
+UNLIMITED_PATHS = ("/health", "/metrics")
+
+RATE_LIMITED = metrics.Counter(
+    "researchpro_rate_limited_total", "Requests rejected by the per-token rate limiter.", ["route_class"])
+ADMISSION_SHED = metrics.Counter(
+    "researchpro_admission_shed_total", "Requests shed because no execution slot became free.", ["reason"])
+ADMISSION_WAITING = metrics.Gauge(
+    "researchpro_admission_waiting", "Requests queued for an execution slot.")
+
+
+def _parse_limit(value: str) -> Optional[Tuple[float, float]]:
+    if value.strip().lower() in ("off", "0", ""):
+        return None
+    rate, _, burst = value.partition("/")
+    rate, burst = float(rate), float(burst or rate)
+    # A bucket that never refills, or never holds a whole token, would admit nothing
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"Rate limit {value!r} needs a rate above 0 and a burst of at least 1; use 'off' to disable")
+    return rate, burst
+
+
+def _pool_capacity() -> int:
+    if isinstance(engine.pool, QueuePool):
+        return engine.pool.size() + max(DB_MAX_OVERFLOW, 0)
+    return 15
+
+
+def route_class(method: str, path: str) -> str:
+    if path.startswith(HEAVY_PATHS):
+        return "heavy"
+    if method in ("GET", "HEAD") or path.endswith("/batch-get"):
+        return "read"
+    return "write"
+
+
+class MemoryBuckets:
+    """Token buckets refilled lazily on access; idle full buckets are swept when the table grows."""
+
+    max_keys = 10_000
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], list] = {}
+
+    async def take(self, key: Tuple[str, str], rate: float, burst: float) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._sweep(now, rate, burst)
+            bucket = self._buckets[key] = [burst, now]
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+    def _sweep(self, now: float, rate: float, burst: float) -> None:
+        idle = [k for k, (tokens, last) in self._buckets.items() if tokens + (now - last) * rate >= burst]
+        for k in idle:
+            del self._buckets[k]
+
+
+class RedisBuckets:
+    """The same token bucket evaluated atomically inside Redis, shared by every worker."""
+
+    _SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+
+    async def take(self, key: Tuple[str, str], rate: float, burst: float) -> float:
+        token, cls = key
+        digest = hashlib.sha256(token.encode()).hexdigest()[:32]
+        wait = await self._script(keys=[f"researchpro:ratelimit:{cls}:{digest}"], args=[rate, burst, time.time()])
+        return float(wait)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, prefix: str = "/api/v1"):
+        self.app = app
+        self.prefix = prefix
+        self.limits = {
+            cls: _parse_limit(os.getenv(f"RATE_LIMIT_{cls.upper()}", default))
+            for cls, default in DEFAULT_LIMITS.items()
+        }
+        redis_url = os.getenv("RATE_LIMIT_REDIS_URL")
+        self.buckets = RedisBuckets(redis_url) if redis_url else MemoryBuckets()
+        self.max_concurrent = int(os.getenv("MAX_CONCURRENT_REQUESTS", "0")) or _pool_capacity()
+        self.queue_size = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+        self.queue_timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._waiting = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNLIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path.startswith(self.prefix):
+            relative = path[len(self.prefix):]
+            cls = route_class(scope["method"], relative)
+            limit = self.limits[cls]
+            if limit is not None:
+                token = _header(scope, b"x-api-token") or "anonymous"
+                wait = await self.buckets.take((token, cls), *limit)
+                if wait > 0:
+                    RATE_LIMITED.inc((cls,))
+                    await _reject(send, 429, "Rate limit exceeded", wait)
+                    return
+            if relative in STREAMING_PATHS:
+                await self.app(scope, receive, send)
+                return
+
+        if self._slots.locked():
+            if self._waiting >= self.queue_size:
+                ADMISSION_SHED.inc(("queue_full",))
+                await _reject(send, 503, "Server busy, retry later", 1)
+                return
+            self._waiting += 1
+            ADMISSION_WAITING.inc()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                ADMISSION_SHED.inc(("timeout",))
+                await _reject(send, 503, "Server busy, retry later", self.queue_timeout)
+                return
+            finally:
+                self._waiting -= 1
+                ADMISSION_WAITING.dec()
+        else:
+            await self._slots.acquire()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float) -> None:
+    body = ('{"detail":"%s"}' % detail).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.activity import METRICS
+from app.auth import get_api_key
+from app.database import get_db
+
+router = APIRouter(tags=["Activity"])
+
+_DEFAULT_SPAN = {"day": timedelta(days=30), "week": timedelta(weeks=12)}
+
+
+@router.get("/activity", response_model=List[schemas.ActivityPoint])
+def activity(
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    from_: Optional[date] = Query(None, alias="from", description="First day, inclusive (default: 30 days / 12 weeks back)"),
+    to: Optional[date] = Query(None, description="Last day, inclusive (default: today, UTC)"),
+    topic_id: Optional[int] = Query(None),
+    author: Optional[str] = Query(None),
+    metric: Optional[str] = Query(None, description="sources_added/notes_written/insights_validated"),
+    group_by: Optional[str] = Query(None, pattern="^(topic|author)$", description="Split each bucket per topic or per author"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    if metric and metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(METRICS)}")
+    to = to or datetime.utcnow().date()
+    from_ = from_ or to - _DEFAULT_SPAN[bucket]
+    if from_ > to:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+
+    Rollup = models.ActivityRollup
+    columns = [Rollup.day, Rollup.metric]
+    if group_by == "topic":
+        columns.append(Rollup.topic_id)
+    elif group_by == "author":
+        columns.append(Rollup.author)
+    q = db.query(*columns, func.sum(Rollup.count)).filter(Rollup.day >= from_, Rollup.day <= to)
+    if topic_id is not None:
+        q = q.filter(Rollup.topic_id == topic_id)
+    if author:
+        q = q.filter(Rollup.author == author)
+    if metric:
+        q = q.filter(Rollup.metric == metric)
+
+    totals = defaultdict(int)
+    for day, row_metric, *group, count in q.group_by(*columns):
+        period = day - timedelta(days=day.weekday()) if bucket == "week" else day
+        totals[(period, row_metric, group[0] if group else None)] += count
+
+    points = []
+    for (period, row_metric, group), count in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1], str(item[0][2]))):
+        point = schemas.ActivityPoint(period=period, metric=row_metric, count=count)
+        if group_by == "topic":
+            point.topic_id = group or None
+        elif group_by == "author":
+            point.author = group or None
+        points.append(point)
+    return points
@@ -0,0 +1,72 @@
+from collections import defaultdict
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import evidence, models, schemas
+from app.auth import get_api_key
+from app.changelog import ENTITIES
+from app.database import get_db
+
+router = APIRouter(tags=["Changes"])
+
+_MODELS = {entity: model for model, entity in ENTITIES.items()}
+_SCHEMAS = {
+    "topic": schemas.TopicResponse,
+    "source": schemas.SourceResponse,
+    "note": schemas.NoteResponse,
+    "insight": schemas.InsightResponse,
+    "collection": schemas.CollectionResponse,
+}
+
+
+@router.get("/changes", response_model=schemas.ChangeFeedResponse)
+def list_changes(
+    since: Optional[str] = Query(None, description="next_token of the previous page; omit to start from the beginning"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    try:
+        after = int(since) if since else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid change token")
+
+    rows = (
+        db.query(models.Change)
+        .filter(models.Change.id > after)
+        .order_by(models.Change.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Current state of everything still alive, one query per entity type
+    wanted = defaultdict(set)
+    for change in rows:
+        if change.op != "delete":
+            wanted[change.entity].add(change.entity_id)
+    current = {}
+    for entity, ids in wanted.items():
+        model = _MODELS[entity]
+        objs = db.query(model).filter(model.id.in_(ids)).all()
+        if model is models.Insight:
+            evidence.attach_linked_sources(db, objs)
+        for obj in objs:
+            current[entity, obj.id] = _SCHEMAS[entity].model_validate(obj)
+
+    changes = [
+        schemas.ChangeResponse(
+            id=change.id,
+            entity=change.entity,
+            entity_id=change.entity_id,
+            op=change.op,
+            topic_id=change.topic_id,
+            changed_at=change.changed_at,
+            data=current.get((change.entity, change.entity_id)),
+        )
+        for change in rows
+    ]
+    next_token = str(rows[-1].id) if rows else str(after)
+    return schemas.ChangeFeedResponse(changes=changes, next_token=next_token, has_more=has_more)
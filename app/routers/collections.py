@@ -1,29 +1,39 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import models, schemas, totals, versioning
 from app.auth import get_api_key
+from app.batch import fetch_in_order
 from app.database import get_db
 
 router = APIRouter(prefix="/collections", tags=["Collections"])
 
 
+def _filters(created_by, shared) -> list:
+    criteria = []
+    if created_by:
+        criteria.append(models.Collection.created_by == created_by)
+    if shared is not None:
+        criteria.append(models.Collection.shared == shared)
+    return criteria
+
+
 @router.get("", response_model=List[schemas.CollectionResponse])
 def list_collections(
+    response: Response,
     created_by: Optional[str] = Query(None),
     shared: Optional[bool] = Query(None),
+    count: totals.CountMode = Query("none", description=totals.DESCRIPTION),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
-    q = db.query(models.Collection)
-    if created_by:
-        q = q.filter(models.Collection.created_by == created_by)
-    if shared is not None:
-        q = q.filter(models.Collection.shared == shared)
+    criteria = _filters(created_by, shared)
+    totals.set_total_count(response, db, models.Collection, criteria, count)
+    q = db.query(models.Collection).filter(*criteria)
     return q.order_by(models.Collection.created_at.desc()).offset(skip).limit(limit).all()
 
 
@@ -40,15 +50,27 @@ def create_collection(
     return collection
 
 
+@router.post("/batch-get", response_model=schemas.BatchGetResponse[schemas.CollectionResponse])
+def batch_get_collections(
+    payload: schemas.BatchGetRequest,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    items, missing = fetch_in_order(db, models.Collection, payload.ids)
+    return {"items": items, "missing": missing}
+
+
 @router.get("/{collection_id}", response_model=schemas.CollectionResponse)
 def get_collection(
     collection_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     collection = db.query(models.Collection).filter(models.Collection.id == collection_id).first()
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
+    versioning.set_etag(response, collection)
     return collection
 
 
@@ -56,29 +78,35 @@ def get_collection(
 def update_collection(
     collection_id: int,
     payload: schemas.CollectionUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     collection = db.query(models.Collection).filter(models.Collection.id == collection_id).first()
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
+    versioning.check_if_match(collection, if_match)
     updates = payload.model_dump(exclude_unset=True)
     for field, value in updates.items():
         setattr(collection, field, value)
     collection.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(collection)
+    versioning.set_etag(response, collection)
     return collection
 
 
 @router.delete("/{collection_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_collection(
     collection_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     collection = db.query(models.Collection).filter(models.Collection.id == collection_id).first()
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
+    versioning.check_if_match(collection, if_match)
     db.delete(collection)
     db.commit()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import evidence, models, schemas
 from app.auth import get_api_key
 from app.database import get_db
 
@@ -34,6 +34,7 @@ def dashboard(
         .limit(_RECENT_LIMIT)
         .all()
     )
+    evidence.attach_linked_sources(db, recent_insights)
 
     # Unreviewed sources: sources with no summary
     unreviewed = (
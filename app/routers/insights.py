@@ -1,39 +1,57 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import evidence, models, schemas, totals, versioning
 from app.auth import get_api_key
+from app.batch import fetch_in_order
+from app.bulk import apply_in_chunks, count_matching
 from app.database import get_db
 
 router = APIRouter(prefix="/insights", tags=["Insights"])
 
 
+def _filters(topic_id, insight_status, confidence, impact, author, created_after=None, created_before=None) -> list:
+    criteria = []
+    if topic_id is not None:
+        criteria.append(models.Insight.topic_id == topic_id)
+    if insight_status:
+        criteria.append(models.Insight.status == insight_status)
+    if confidence:
+        criteria.append(models.Insight.confidence == confidence)
+    if impact:
+        criteria.append(models.Insight.impact == impact)
+    if author:
+        criteria.append(models.Insight.author == author)
+    # Half-open like the monthly partitions, which the planner can then prune (app.partitions)
+    if created_after is not None:
+        criteria.append(models.Insight.created_at >= created_after)
+    if created_before is not None:
+        criteria.append(models.Insight.created_at < created_before)
+    return criteria
+
+
 @router.get("", response_model=List[schemas.InsightResponse])
 def list_insights(
+    response: Response,
     topic_id: Optional[int] = Query(None),
     insight_status: Optional[str] = Query(None, alias="status", description="hypothesis/validated/actionable/archived"),
     confidence: Optional[str] = Query(None),
     impact: Optional[str] = Query(None),
     author: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only insights created at or after this time (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Only insights created before this time (UTC)"),
+    count: totals.CountMode = Query("none", description=totals.DESCRIPTION),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
-    q = db.query(models.Insight)
-    if topic_id is not None:
-        q = q.filter(models.Insight.topic_id == topic_id)
-    if insight_status:
-        q = q.filter(models.Insight.status == insight_status)
-    if confidence:
-        q = q.filter(models.Insight.confidence == confidence)
-    if impact:
-        q = q.filter(models.Insight.impact == impact)
-    if author:
-        q = q.filter(models.Insight.author == author)
-    return q.order_by(models.Insight.created_at.desc()).offset(skip).limit(limit).all()
+    criteria = _filters(topic_id, insight_status, confidence, impact, author, created_after, created_before)
+    totals.set_total_count(response, db, models.Insight, criteria, count)
+    q = db.query(models.Insight).filter(*criteria)
+    return evidence.attach_linked_sources(db, q.order_by(models.Insight.created_at.desc()).offset(skip).limit(limit))
 
 
 @router.post("", response_model=schemas.InsightResponse, status_code=status.HTTP_201_CREATED)
@@ -44,55 +62,138 @@ def create_insight(
 ):
     if not db.query(models.Topic).filter(models.Topic.id == payload.topic_id).first():
         raise HTTPException(status_code=404, detail="Topic not found")
-    insight = models.Insight(**payload.model_dump())
+    fields = payload.model_dump()
+    links = fields.pop("evidence_sources")
+    if evidence.unknown_sources(db, links):
+        raise HTTPException(status_code=404, detail="Source not found")
+    insight = models.Insight(**fields)
     db.add(insight)
+    if links:
+        db.flush()
+        evidence.set_links(db, insight.id, links)
     db.commit()
     db.refresh(insight)
+    evidence.attach_linked_sources(db, [insight])
     return insight
 
 
+@router.patch("", response_model=schemas.BulkWriteResponse)
+def bulk_update_insights(
+    payload: schemas.InsightUpdate,
+    topic_id: Optional[int] = Query(None),
+    insight_status: Optional[str] = Query(None, alias="status", description="hypothesis/validated/actionable/archived"),
+    confidence: Optional[str] = Query(None),
+    impact: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only insights created at or after this time (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Only insights created before this time (UTC)"),
+    dry_run: bool = Query(False, description="Only count the insights that would change"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    criteria = _filters(topic_id, insight_status, confidence, impact, author, created_after, created_before)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    updates = payload.model_dump(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    if "evidence_sources" in updates:
+        raise HTTPException(status_code=400, detail="evidence_sources cannot be updated in bulk")
+    if "topic_id" in updates:
+        if not db.query(models.Topic).filter(models.Topic.id == updates["topic_id"]).first():
+            raise HTTPException(status_code=404, detail="Topic not found")
+    if dry_run:
+        return {"matched": count_matching(db, models.Insight, criteria), "dry_run": True}
+    return {"matched": apply_in_chunks(db, models.Insight, criteria, updates), "dry_run": False}
+
+
+@router.delete("", response_model=schemas.BulkWriteResponse)
+def bulk_delete_insights(
+    topic_id: Optional[int] = Query(None),
+    insight_status: Optional[str] = Query(None, alias="status", description="hypothesis/validated/actionable/archived"),
+    confidence: Optional[str] = Query(None),
+    impact: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only insights created at or after this time (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Only insights created before this time (UTC)"),
+    dry_run: bool = Query(False, description="Only count the insights that would be deleted"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    criteria = _filters(topic_id, insight_status, confidence, impact, author, created_after, created_before)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    if dry_run:
+        return {"matched": count_matching(db, models.Insight, criteria), "dry_run": True}
+    return {"matched": apply_in_chunks(db, models.Insight, criteria), "dry_run": False}
+
+
+@router.post("/batch-get", response_model=schemas.BatchGetResponse[schemas.InsightResponse])
+def batch_get_insights(
+    payload: schemas.BatchGetRequest,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    items, missing = fetch_in_order(db, models.Insight, payload.ids)
+    return {"items": evidence.attach_linked_sources(db, items), "missing": missing}
+
+
 @router.get("/{insight_id}", response_model=schemas.InsightResponse)
 def get_insight(
     insight_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     insight = db.query(models.Insight).filter(models.Insight.id == insight_id).first()
     if not insight:
         raise HTTPException(status_code=404, detail="Insight not found")
-    return insight
+    versioning.set_etag(response, insight)
+    return evidence.attach_linked_sources(db, [insight])[0]
 
 
 @router.patch("/{insight_id}", response_model=schemas.InsightResponse)
 def update_insight(
     insight_id: int,
     payload: schemas.InsightUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     insight = db.query(models.Insight).filter(models.Insight.id == insight_id).first()
     if not insight:
         raise HTTPException(status_code=404, detail="Insight not found")
+    versioning.check_if_match(insight, if_match)
     updates = payload.model_dump(exclude_unset=True)
     if "topic_id" in updates:
         if not db.query(models.Topic).filter(models.Topic.id == updates["topic_id"]).first():
             raise HTTPException(status_code=404, detail="Topic not found")
+    links = updates.pop("evidence_sources", None)
+    if links is not None:
+        if evidence.unknown_sources(db, links):
+            raise HTTPException(status_code=404, detail="Source not found")
+        evidence.set_links(db, insight.id, links)
     for field, value in updates.items():
         setattr(insight, field, value)
     insight.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(insight)
+    evidence.attach_linked_sources(db, [insight])
+    versioning.set_etag(response, insight)
     return insight
 
 
 @router.delete("/{insight_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_insight(
     insight_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     insight = db.query(models.Insight).filter(models.Insight.id == insight_id).first()
     if not insight:
         raise HTTPException(status_code=404, detail="Insight not found")
+    versioning.check_if_match(insight, if_match)
     db.delete(insight)
     db.commit()
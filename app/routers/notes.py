@@ -1,41 +1,78 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import ingest, models, schemas, totals, versioning
 from app.auth import get_api_key
+from app.batch import fetch_in_order
+from app.bulk import apply_in_chunks, count_matching
 from app.database import get_db
 
 router = APIRouter(prefix="/notes", tags=["Notes"])
 
 
+def _filters(topic_id, source_id, author, created_after=None, created_before=None) -> list:
+    criteria = []
+    if topic_id is not None:
+        criteria.append(models.Note.topic_id == topic_id)
+    if source_id is not None:
+        criteria.append(models.Note.source_id == source_id)
+    if author:
+        criteria.append(models.Note.author == author)
+    # Half-open like the monthly partitions, which the planner can then prune (app.partitions)
+    if created_after is not None:
+        criteria.append(models.Note.created_at >= created_after)
+    if created_before is not None:
+        criteria.append(models.Note.created_at < created_before)
+    return criteria
+
+
 @router.get("", response_model=List[schemas.NoteResponse])
 def list_notes(
+    response: Response,
     topic_id: Optional[int] = Query(None),
     source_id: Optional[int] = Query(None),
     author: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only notes created at or after this time (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Only notes created before this time (UTC)"),
+    count: totals.CountMode = Query("none", description=totals.DESCRIPTION),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
-    q = db.query(models.Note)
-    if topic_id is not None:
-        q = q.filter(models.Note.topic_id == topic_id)
-    if source_id is not None:
-        q = q.filter(models.Note.source_id == source_id)
-    if author:
-        q = q.filter(models.Note.author == author)
+    criteria = _filters(topic_id, source_id, author, created_after, created_before)
+    totals.set_total_count(response, db, models.Note, criteria, count)
+    q = db.query(models.Note).filter(*criteria)
     return q.order_by(models.Note.created_at.desc()).offset(skip).limit(limit).all()
 
 
-@router.post("", response_model=schemas.NoteResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "",
+    response_model=schemas.NoteResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={202: {"model": schemas.NoteIngestResponse, "description": "Note queued for a grouped write"}},
+)
 def create_note(
     payload: schemas.NoteCreate,
+    buffered: bool = Query(
+        False, description="Queue the note for a grouped write and answer 202 at once; poll GET /notes/buffered/{tracking_id}"
+    ),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
+    if buffered:
+        try:
+            tracking_id = ingest.buffer.submit(payload.model_dump())
+        except ingest.Rejected as exc:
+            raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+        return JSONResponse(
+            schemas.NoteIngestResponse(tracking_id=tracking_id, status="pending").model_dump(mode="json"),
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"Location": f"/api/v1/notes/buffered/{tracking_id}"},
+        )
     note = models.Note(**payload.model_dump())
     db.add(note)
     db.commit()
@@ -43,15 +80,86 @@ def create_note(
     return note
 
 
+@router.patch("", response_model=schemas.BulkWriteResponse)
+def bulk_update_notes(
+    payload: schemas.NoteUpdate,
+    topic_id: Optional[int] = Query(None),
+    source_id: Optional[int] = Query(None),
+    author: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only notes created at or after this time (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Only notes created before this time (UTC)"),
+    dry_run: bool = Query(False, description="Only count the notes that would change"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    criteria = _filters(topic_id, source_id, author, created_after, created_before)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    updates = payload.model_dump(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    if dry_run:
+        return {"matched": count_matching(db, models.Note, criteria), "dry_run": True}
+    return {"matched": apply_in_chunks(db, models.Note, criteria, updates), "dry_run": False}
+
+
+@router.delete("", response_model=schemas.BulkWriteResponse)
+def bulk_delete_notes(
+    topic_id: Optional[int] = Query(None),
+    source_id: Optional[int] = Query(None),
+    author: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only notes created at or after this time (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Only notes created before this time (UTC)"),
+    dry_run: bool = Query(False, description="Only count the notes that would be deleted"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    criteria = _filters(topic_id, source_id, author, created_after, created_before)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    if dry_run:
+        return {"matched": count_matching(db, models.Note, criteria), "dry_run": True}
+    return {"matched": apply_in_chunks(db, models.Note, criteria), "dry_run": False}
+
+
+@router.post("/batch-get", response_model=schemas.BatchGetResponse[schemas.NoteResponse])
+def batch_get_notes(
+    payload: schemas.BatchGetRequest,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    items, missing = fetch_in_order(db, models.Note, payload.ids)
+    return {"items": items, "missing": missing}
+
+
+@router.get("/buffered/{tracking_id}", response_model=schemas.NoteIngestResponse)
+def get_buffered_note(
+    tracking_id: str,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    """Whether a note posted with `buffered=true` has been written yet, and its id once it has."""
+    held = ingest.buffer.status(tracking_id)
+    if held is not None:
+        return schemas.NoteIngestResponse(tracking_id=tracking_id, status=held[0], error=held[1])
+    note_id = db.query(models.Note.id).filter(models.Note.ingest_id == tracking_id).scalar()
+    if note_id is None:
+        # Another worker's buffer may still hold it
+        raise HTTPException(status_code=404, detail="Unknown tracking id, or not written yet")
+    return schemas.NoteIngestResponse(tracking_id=tracking_id, status="written", note_id=note_id)
+
+
 @router.get("/{note_id}", response_model=schemas.NoteResponse)
 def get_note(
     note_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     note = db.query(models.Note).filter(models.Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    versioning.set_etag(response, note)
     return note
 
 
@@ -59,29 +167,35 @@ def get_note(
 def update_note(
     note_id: int,
     payload: schemas.NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     note = db.query(models.Note).filter(models.Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    versioning.check_if_match(note, if_match)
     updates = payload.model_dump(exclude_unset=True)
     for field, value in updates.items():
         setattr(note, field, value)
     note.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(note)
+    versioning.set_etag(response, note)
     return note
 
 
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_note(
     note_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     note = db.query(models.Note).filter(models.Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    versioning.check_if_match(note, if_match)
     db.delete(note)
     db.commit()
@@ -0,0 +1,169 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import fuzzy, jobs, matching, models, schemas, versioning
+from app.auth import get_api_key
+from app.database import get_db
+from app.saved_searches import current_mark
+
+router = APIRouter(prefix="/saved-searches", tags=["Saved searches"])
+
+
+def _get_or_404(db: Session, saved_search_id: int) -> models.SavedSearch:
+    search = db.query(models.SavedSearch).filter(models.SavedSearch.id == saved_search_id).first()
+    if not search:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return search
+
+
+@router.get("", response_model=List[schemas.SavedSearchResponse])
+def list_saved_searches(
+    owner: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    q = db.query(models.SavedSearch)
+    if owner:
+        q = q.filter(models.SavedSearch.owner == owner)
+    return q.order_by(models.SavedSearch.created_at.desc()).offset(skip).limit(limit).all()
+
+
+@router.post("", response_model=schemas.SavedSearchResponse, status_code=status.HTTP_201_CREATED)
+def create_saved_search(
+    payload: schemas.SavedSearchCreate,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    # Only material changed after this point counts as new
+    search = models.SavedSearch(**payload.model_dump(), last_change_id=current_mark(db))
+    db.add(search)
+    db.commit()
+    db.refresh(search)
+    return search
+
+
+@router.post("/evaluate", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.JobResponse)
+def evaluate_saved_searches(
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    """Evaluate every saved search now rather than at the next scheduled run; poll `GET /jobs/{id}`."""
+    job = jobs.enqueue(db, "evaluate_saved_searches", {})
+    db.commit()
+    db.refresh(job)
+    return JSONResponse(
+        schemas.JobResponse.model_validate(job).model_dump(mode="json"),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/api/v1/jobs/{job.id}"},
+    )
+
+
+@router.get("/{saved_search_id}", response_model=schemas.SavedSearchResponse)
+def get_saved_search(
+    saved_search_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    search = _get_or_404(db, saved_search_id)
+    versioning.set_etag(response, search)
+    return search
+
+
+@router.patch("/{saved_search_id}", response_model=schemas.SavedSearchResponse)
+def update_saved_search(
+    saved_search_id: int,
+    payload: schemas.SavedSearchUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    search = _get_or_404(db, saved_search_id)
+    versioning.check_if_match(search, if_match)
+    updates = payload.model_dump(exclude_unset=True)
+    for field, value in updates.items():
+        setattr(search, field, value)
+    search.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(search)
+    versioning.set_etag(response, search)
+    return search
+
+
+@router.delete("/{saved_search_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_saved_search(
+    saved_search_id: int,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    search = _get_or_404(db, saved_search_id)
+    versioning.check_if_match(search, if_match)
+    db.delete(search)
+    db.commit()
+
+
+@router.get("/{saved_search_id}/new", response_model=schemas.SavedSearchHitsResponse)
+def list_new_hits(
+    saved_search_id: int,
+    since: Optional[str] = Query(None, description="next_token of the previous page; omit to start from the first hit"),
+    full_content: bool = Query(False, description="return each hit's full text instead of a highlighted snippet"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    """Hits recorded by the scheduled evaluations, oldest first, with each row's current title and text."""
+    search = _get_or_404(db, saved_search_id)
+    try:
+        after = int(since) if since else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid hit token")
+
+    hit = models.SavedSearchHit
+    rows = (
+        db.query(hit)
+        .filter(hit.saved_search_id == search.id, hit.id > after)
+        .order_by(hit.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Current state of the rows still alive, one query per result type
+    current = {}
+    for result_type, (model, title, _body, _facet_columns) in matching.SEARCHED.items():
+        ids = {row.entity_id for row in rows if row.result_type == result_type}
+        if not ids:
+            continue
+        columns = [model.id, model.topic_id, model.created_at]
+        if title:
+            columns.append(getattr(model, title).label("title"))
+        for found in db.execute(select(*columns).where(model.id.in_(ids))):
+            current[result_type, found.id] = found
+
+    hits = []
+    for row in rows:
+        found = current.get((row.result_type, row.entity_id))
+        if found is None:
+            continue
+        hits.append(schemas.SavedSearchHitResponse(
+            result_type=row.result_type,
+            id=found.id,
+            title=getattr(found, "title", None),
+            content=None,
+            topic_id=found.topic_id,
+            created_at=found.created_at,
+            found_at=row.found_at,
+        ))
+    threshold = (search.threshold or fuzzy.DEFAULT_THRESHOLD) if search.mode == "fuzzy" else None
+    matching.fill_text(db, hits, search.q, full_content, threshold)
+    next_token = str(rows[-1].id) if rows else str(after)
+    return schemas.SavedSearchHitsResponse(hits=hits, next_token=next_token, has_more=has_more)
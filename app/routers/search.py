@@ -1,10 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import fuzzy, matching, schemas, suggest as suggestions
 from app.auth import get_api_key
 from app.database import get_db
+from app.matching import FACETS, SEARCHED
+from app.stats import UNSPECIFIED
 
 router = APIRouter(tags=["Search"])
 
@@ -12,71 +16,78 @@ router = APIRouter(tags=["Search"])
 @router.get("/search", response_model=schemas.SearchResponse)
 def search(
     q: str = Query(..., min_length=1, description="Keyword to search across sources, notes, and insights"),
+    mode: Literal["exact", "fuzzy"] = Query("exact", description="exact substring, or fuzzy (typo-tolerant)"),
+    threshold: float = Query(fuzzy.DEFAULT_THRESHOLD, gt=0, le=1, description="fuzzy mode: minimum similarity"),
+    full_content: bool = Query(False, description="return each hit's full text instead of a highlighted snippet"),
+    facets: Optional[str] = Query(None, description="comma-separated counts to return: " + ",".join(FACETS)),
+    result_type: Optional[Literal["source", "note", "insight"]] = Query(None),
+    topic_id: Optional[int] = Query(None),
+    credibility: Optional[str] = Query(None, description="sources only: low/medium/high"),
+    insight_status: Optional[str] = Query(None, alias="status", description="insights only: hypothesis/validated/actionable/archived"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
-    pattern = f"%{q}%"
-    results: List[schemas.SearchResult] = []
+    wanted = [name.strip() for name in facets.split(",") if name.strip()] if facets else []
+    unknown = [name for name in wanted if name not in FACETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"facets must be among {', '.join(FACETS)}")
+    filters = {"result_type": result_type, "topic_id": topic_id, "credibility": credibility, "status": insight_status}
 
-    # Search sources (title + summary)
-    sources = (
-        db.query(models.Source)
-        .filter(
-            models.Source.title.ilike(pattern) | models.Source.summary.ilike(pattern)
-        )
-        .all()
-    )
-    for s in sources:
-        results.append(
-            schemas.SearchResult(
-                result_type="source",
-                id=s.id,
-                title=s.title,
-                content=s.summary,
-                topic_id=s.topic_id,
-                created_at=s.created_at,
+    # Search sources (title + summary), notes (content) and insights (title + content).
+    # Facets are counted over the hit rows, which every search loads anyway to
+    # rank across types and report the total. A GROUP BY count per facet would
+    # run the text match again for each facet, and on SQLite the fuzzy
+    # threshold is applied in Python, so no grouped query could select those hits.
+    results: List[schemas.SearchResult] = []
+    counts: Dict[str, Dict[str, int]] = {name: defaultdict(int) for name in wanted}
+    for type_, (_model, title, _body, facet_columns) in SEARCHED.items():
+        for row, score in matching.hits(db, type_, q, mode, threshold, filters):
+            results.append(
+                schemas.SearchResult(
+                    result_type=type_,
+                    id=row.id,
+                    title=row.title if title else None,
+                    content=None,
+                    topic_id=row.topic_id,
+                    created_at=row.created_at,
+                    score=score,
+                )
             )
-        )
+            values = {"result_type": type_, "topic_id": row.topic_id}
+            values.update((name, getattr(row, name)) for name in facet_columns)
+            for name in wanted:
+                if name in values:
+                    value = values[name]
+                    counts[name][UNSPECIFIED if value is None else str(value)] += 1
 
-    # Search notes (content)
-    notes = db.query(models.Note).filter(models.Note.content.ilike(pattern)).all()
-    for n in notes:
-        results.append(
-            schemas.SearchResult(
-                result_type="note",
-                id=n.id,
-                title=None,
-                content=n.content,
-                topic_id=n.topic_id,
-                created_at=n.created_at,
-            )
-        )
+    if mode == "fuzzy":
+        # Rank by similarity weighted by recency
+        now = datetime.utcnow()
+        for r in results:
+            r.score = round(r.score * fuzzy.recency(r.created_at, now), 4)
+        results.sort(key=lambda r: r.score, reverse=True)
+    else:
+        # Sort combined results by recency
+        results.sort(key=lambda r: r.created_at, reverse=True)
+    total = len(results)
+    paginated = results[skip : skip + limit]
+    matching.fill_text(db, paginated, q, full_content, threshold if mode == "fuzzy" else None)
 
-    # Search insights (title + content)
-    insights = (
-        db.query(models.Insight)
-        .filter(
-            models.Insight.title.ilike(pattern) | models.Insight.content.ilike(pattern)
-        )
-        .all()
+    return schemas.SearchResponse(
+        query=q,
+        total=total,
+        results=paginated,
+        facets={name: dict(values) for name, values in counts.items()} if facets else None,
     )
-    for i in insights:
-        results.append(
-            schemas.SearchResult(
-                result_type="insight",
-                id=i.id,
-                title=i.title,
-                content=i.content,
-                topic_id=i.topic_id,
-                created_at=i.created_at,
-            )
-        )
 
-    # Sort combined results by recency and paginate
-    results.sort(key=lambda r: r.created_at, reverse=True)
-    total = len(results)
-    paginated = results[skip : skip + limit]
 
-    return schemas.SearchResponse(query=q, total=total, results=paginated)
+@router.get("/suggest", response_model=schemas.SuggestResponse)
+def suggest(
+    q: str = Query(..., min_length=1, max_length=100, description="Prefix or fragment typed so far"),
+    limit: int = Query(suggestions.DEFAULT_LIMIT, ge=1, le=suggestions.MAX_LIMIT, description="Suggestions per kind"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    return schemas.SuggestResponse(query=q, **suggestions.suggest(db, q.strip() or q, limit))
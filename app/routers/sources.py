@@ -1,35 +1,46 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import evidence, models, schemas, totals, versioning
 from app.auth import get_api_key
+from app.batch import fetch_in_order
+from app.bulk import apply_in_chunks, count_matching
 from app.database import get_db
 
 router = APIRouter(prefix="/sources", tags=["Sources"])
 
 
+def _filters(topic_id, type, credibility, added_by) -> list:
+    criteria = []
+    if topic_id is not None:
+        criteria.append(models.Source.topic_id == topic_id)
+    if type:
+        criteria.append(models.Source.type == type)
+    if credibility:
+        criteria.append(models.Source.credibility == credibility)
+    if added_by:
+        criteria.append(models.Source.added_by == added_by)
+    return criteria
+
+
 @router.get("", response_model=List[schemas.SourceResponse])
 def list_sources(
+    response: Response,
     topic_id: Optional[int] = Query(None, description="Filter by topic"),
     type: Optional[str] = Query(None, description="Filter by source type"),
     credibility: Optional[str] = Query(None, description="Filter by credibility"),
     added_by: Optional[str] = Query(None, description="Filter by contributor"),
+    count: totals.CountMode = Query("none", description=totals.DESCRIPTION),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
-    q = db.query(models.Source)
-    if topic_id is not None:
-        q = q.filter(models.Source.topic_id == topic_id)
-    if type:
-        q = q.filter(models.Source.type == type)
-    if credibility:
-        q = q.filter(models.Source.credibility == credibility)
-    if added_by:
-        q = q.filter(models.Source.added_by == added_by)
+    criteria = _filters(topic_id, type, credibility, added_by)
+    totals.set_total_count(response, db, models.Source, criteria, count)
+    q = db.query(models.Source).filter(*criteria)
     return q.order_by(models.Source.created_at.desc()).offset(skip).limit(limit).all()
 
 
@@ -46,15 +57,67 @@ def create_source(
     return source
 
 
+@router.patch("", response_model=schemas.BulkWriteResponse)
+def bulk_update_sources(
+    payload: schemas.SourceUpdate,
+    topic_id: Optional[int] = Query(None, description="Filter by topic"),
+    type: Optional[str] = Query(None, description="Filter by source type"),
+    credibility: Optional[str] = Query(None, description="Filter by credibility"),
+    added_by: Optional[str] = Query(None, description="Filter by contributor"),
+    dry_run: bool = Query(False, description="Only count the sources that would change"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    criteria = _filters(topic_id, type, credibility, added_by)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    updates = payload.model_dump(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    if dry_run:
+        return {"matched": count_matching(db, models.Source, criteria), "dry_run": True}
+    return {"matched": apply_in_chunks(db, models.Source, criteria, updates), "dry_run": False}
+
+
+@router.delete("", response_model=schemas.BulkWriteResponse)
+def bulk_delete_sources(
+    topic_id: Optional[int] = Query(None, description="Filter by topic"),
+    type: Optional[str] = Query(None, description="Filter by source type"),
+    credibility: Optional[str] = Query(None, description="Filter by credibility"),
+    added_by: Optional[str] = Query(None, description="Filter by contributor"),
+    dry_run: bool = Query(False, description="Only count the sources that would be deleted"),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    criteria = _filters(topic_id, type, credibility, added_by)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    if dry_run:
+        return {"matched": count_matching(db, models.Source, criteria), "dry_run": True}
+    return {"matched": apply_in_chunks(db, models.Source, criteria), "dry_run": False}
+
+
+@router.post("/batch-get", response_model=schemas.BatchGetResponse[schemas.SourceResponse])
+def batch_get_sources(
+    payload: schemas.BatchGetRequest,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    items, missing = fetch_in_order(db, models.Source, payload.ids)
+    return {"items": items, "missing": missing}
+
+
 @router.get("/{source_id}", response_model=schemas.SourceResponse)
 def get_source(
     source_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     source = db.query(models.Source).filter(models.Source.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
+    versioning.set_etag(response, source)
     return source
 
 
@@ -62,29 +125,54 @@ def get_source(
 def update_source(
     source_id: int,
     payload: schemas.SourceUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     source = db.query(models.Source).filter(models.Source.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
+    versioning.check_if_match(source, if_match)
     updates = payload.model_dump(exclude_unset=True)
     for field, value in updates.items():
         setattr(source, field, value)
     source.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(source)
+    versioning.set_etag(response, source)
     return source
 
 
 @router.delete("/{source_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_source(
     source_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     source = db.query(models.Source).filter(models.Source.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
+    versioning.check_if_match(source, if_match)
     db.delete(source)
     db.commit()
+
+
+@router.get("/{source_id}/insights", response_model=List[schemas.InsightResponse])
+def list_source_insights(
+    source_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    """Insights that cite this source as evidence."""
+    if not db.query(models.Source).filter(models.Source.id == source_id).first():
+        raise HTTPException(status_code=404, detail="Source not found")
+    q = (
+        db.query(models.Insight)
+        .join(models.InsightEvidence, models.InsightEvidence.insight_id == models.Insight.id)
+        .filter(models.InsightEvidence.source_id == source_id)
+    )
+    return evidence.attach_linked_sources(db, q.order_by(models.Insight.created_at.desc()).offset(skip).limit(limit))
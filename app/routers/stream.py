@@ -0,0 +1,82 @@
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app import models
+from app.auth import get_api_key
+from app.database import SessionLocal
+from app.events import change_event, hub
+
+router = APIRouter(tags=["Stream"])
+
+_HEARTBEAT_SECONDS = 15
+_REPLAY_PAGE = 1000
+
+
+def _replay(after: int, topic_id: Optional[int]) -> list:
+    db = SessionLocal()
+    try:
+        q = db.query(models.Change).filter(models.Change.id > after)
+        if topic_id is not None:
+            q = q.filter(models.Change.topic_id == topic_id)
+        return [change_event(c) for c in q.order_by(models.Change.id).limit(_REPLAY_PAGE)]
+    finally:
+        db.close()
+
+
+def _frame(item: dict) -> str:
+    return f"id: {item['id']}\nevent: change\ndata: {json.dumps(item)}\n\n"
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_changes(
+    topic_id: Optional[int] = Query(None, description="Only stream changes belonging to this topic"),
+    last_event_id: Optional[int] = Header(None, description="Resume after this change id"),
+    _: str = Depends(get_api_key),
+):
+    """Server-Sent Events stream of committed changes (see `GET /changes` for the event fields)."""
+    await hub.start()
+
+    async def events():
+        # Subscribe before replaying so nothing committed in between is missed;
+        # here rather than in the endpoint, so a client gone before the first
+        # chunk never leaves a subscriber behind
+        subscriber = hub.subscribe(topic_id)
+        try:
+            yield "retry: 3000\n\n"
+            last = last_event_id or 0
+            if last_event_id is not None:
+                # Replay the whole gap, a page at a time: the queue only holds
+                # what the hub read after we subscribed. Changes it also holds
+                # are skipped below as already sent.
+                while True:
+                    page = await run_in_threadpool(_replay, last, topic_id)
+                    for item in page:
+                        last = item["id"]
+                        yield _frame(item)
+                    if len(page) < _REPLAY_PAGE:
+                        break
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), _HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    # Fell too far behind; the client reconnects with Last-Event-ID
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                if item["id"] > last:
+                    last = item["id"]
+                    yield _frame(item)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,32 +1,44 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from app import models, schemas
+from app import evidence, jobs, models, schemas, totals, versioning
 from app.auth import get_api_key
+from app.batch import fetch_in_order
 from app.database import get_db
+from app.stats import topic_stats
 
 router = APIRouter(prefix="/topics", tags=["Topics"])
 
 
+def _filters(status, category, owner) -> list:
+    criteria = []
+    if status:
+        criteria.append(models.Topic.status == status)
+    if category:
+        criteria.append(models.Topic.category == category)
+    if owner:
+        criteria.append(models.Topic.owner == owner)
+    return criteria
+
+
 @router.get("", response_model=List[schemas.TopicResponse])
 def list_topics(
+    response: Response,
     status: Optional[str] = Query(None, description="Filter by status"),
     category: Optional[str] = Query(None, description="Filter by category"),
     owner: Optional[str] = Query(None, description="Filter by owner"),
+    count: totals.CountMode = Query("none", description=totals.DESCRIPTION),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
-    q = db.query(models.Topic)
-    if status:
-        q = q.filter(models.Topic.status == status)
-    if category:
-        q = q.filter(models.Topic.category == category)
-    if owner:
-        q = q.filter(models.Topic.owner == owner)
+    criteria = _filters(status, category, owner)
+    totals.set_total_count(response, db, models.Topic, criteria, count)
+    q = db.query(models.Topic).filter(*criteria)
     return q.order_by(models.Topic.created_at.desc()).offset(skip).limit(limit).all()
 
 
@@ -43,15 +55,41 @@ def create_topic(
     return topic
 
 
+@router.post("/batch-get", response_model=schemas.BatchGetResponse[schemas.TopicResponse])
+def batch_get_topics(
+    payload: schemas.BatchGetRequest,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    items, missing = fetch_in_order(db, models.Topic, payload.ids)
+    return {"items": items, "missing": missing}
+
+
+@router.get("/stats", response_model=List[schemas.TopicStatsResponse])
+def list_topic_stats(
+    status: Optional[str] = Query(None, description="Filter by status"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    owner: Optional[str] = Query(None, description="Filter by owner"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    q = db.query(models.Topic).filter(*_filters(status, category, owner))
+    return topic_stats(db, q.order_by(models.Topic.created_at.desc()).offset(skip).limit(limit).all())
+
+
 @router.get("/{topic_id}", response_model=schemas.TopicResponse)
 def get_topic(
     topic_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     topic = db.query(models.Topic).filter(models.Topic.id == topic_id).first()
     if not topic:
         raise HTTPException(status_code=404, detail="Topic not found")
+    versioning.set_etag(response, topic)
     return topic
 
 
@@ -59,36 +97,68 @@ def get_topic(
 def update_topic(
     topic_id: int,
     payload: schemas.TopicUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     topic = db.query(models.Topic).filter(models.Topic.id == topic_id).first()
     if not topic:
         raise HTTPException(status_code=404, detail="Topic not found")
+    versioning.check_if_match(topic, if_match)
     updates = payload.model_dump(exclude_unset=True)
     for field, value in updates.items():
         setattr(topic, field, value)
     topic.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(topic)
+    versioning.set_etag(response, topic)
     return topic
 
 
-@router.delete("/{topic_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{topic_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={202: {"model": schemas.JobResponse, "description": "Deletion queued as a background job"}},
+)
 def delete_topic(
     topic_id: int,
+    background: bool = Query(False, description="Run the deletion as a job; poll GET /jobs/{id}"),
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     _: str = Depends(get_api_key),
 ):
     topic = db.query(models.Topic).filter(models.Topic.id == topic_id).first()
     if not topic:
         raise HTTPException(status_code=404, detail="Topic not found")
+    versioning.check_if_match(topic, if_match)
+    if background:
+        job = jobs.enqueue(db, "delete_topic", {"topic_id": topic_id})
+        db.commit()
+        db.refresh(job)
+        return JSONResponse(
+            schemas.JobResponse.model_validate(job).model_dump(mode="json"),
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"Location": f"/api/v1/jobs/{job.id}"},
+        )
     db.delete(topic)
     db.commit()
 
 
 # ── Sub-resources ─────────────────────────────────────────────────────────────
 
+@router.get("/{topic_id}/stats", response_model=schemas.TopicStatsResponse)
+def get_topic_stats(
+    topic_id: int,
+    db: Session = Depends(get_db),
+    _: str = Depends(get_api_key),
+):
+    topic = db.query(models.Topic).filter(models.Topic.id == topic_id).first()
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return topic_stats(db, [topic])[0]
+
+
 @router.get("/{topic_id}/sources", response_model=List[schemas.SourceResponse])
 def list_topic_sources(
     topic_id: int,
@@ -120,4 +190,4 @@ def list_topic_insights(
     q = db.query(models.Insight).filter(models.Insight.topic_id == topic_id)
     if insight_status:
         q = q.filter(models.Insight.status == insight_status)
-    return q.order_by(models.Insight.created_at.desc()).offset(skip).limit(limit).all()
+    return evidence.attach_linked_sources(db, q.order_by(models.Insight.created_at.desc()).offset(skip).limit(limit))
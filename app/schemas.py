@@ -1,7 +1,9 @@
 from __future__ import annotations
 from datetime import date, datetime
-from typing import List, Optional, Any
-from pydantic import BaseModel, ConfigDict
+from typing import Dict, Generic, List, Literal, Optional, Any, TypeVar
+from pydantic import BaseModel, ConfigDict, Field
+
+T = TypeVar("T")
 
 
 # ── Topic ────────────────────────────────────────────────────────────────────
@@ -36,6 +38,19 @@ class TopicResponse(BaseModel):
     tags: List[Any]
     created_at: datetime
     updated_at: datetime
+    version: int
+
+
+class TopicStatsResponse(BaseModel):
+    topic_id: int
+    sources_total: int
+    sources_by_type: Dict[str, int]
+    sources_by_credibility: Dict[str, int]
+    insights_total: int
+    insights_by_status: Dict[str, int]
+    insight_matrix: Dict[str, Dict[str, int]]   # confidence -> impact -> count
+    notes_total: int
+    last_activity: Optional[datetime]
 
 
 # ── Source ───────────────────────────────────────────────────────────────────
@@ -85,6 +100,7 @@ class SourceResponse(BaseModel):
     added_by: Optional[str]
     created_at: datetime
     updated_at: datetime
+    version: int
 
 
 # ── Note ─────────────────────────────────────────────────────────────────────
@@ -116,10 +132,30 @@ class NoteResponse(BaseModel):
     tags: List[Any]
     created_at: datetime
     updated_at: datetime
+    version: int
+
+
+class NoteIngestResponse(BaseModel):
+    tracking_id: str
+    status: str   # pending, written or failed
+    note_id: Optional[int] = None
+    error: Optional[str] = None
 
 
 # ── Insight ───────────────────────────────────────────────────────────────────
 
+class EvidenceLink(BaseModel):
+    source_id: int
+    quote: Optional[str] = None
+
+
+class LinkedSource(BaseModel):
+    source_id: int
+    title: str
+    credibility: Optional[str]
+    quote: Optional[str]
+
+
 class InsightCreate(BaseModel):
     topic_id: int
     title: str
@@ -129,6 +165,7 @@ class InsightCreate(BaseModel):
     impact: str = "medium"           # low / medium / high
     status: str = "hypothesis"       # hypothesis/validated/actionable/archived
     author: Optional[str] = None
+    evidence_sources: List[EvidenceLink] = []
 
 
 class InsightUpdate(BaseModel):
@@ -140,6 +177,7 @@ class InsightUpdate(BaseModel):
     impact: Optional[str] = None
     status: Optional[str] = None
     author: Optional[str] = None
+    evidence_sources: Optional[List[EvidenceLink]] = None   # replaces the insight's links
 
 
 class InsightResponse(BaseModel):
@@ -154,8 +192,10 @@ class InsightResponse(BaseModel):
     impact: str
     status: str
     author: Optional[str]
+    linked_sources: List[LinkedSource] = []
     created_at: datetime
     updated_at: datetime
+    version: int
 
 
 # ── Collection ────────────────────────────────────────────────────────────────
@@ -190,6 +230,7 @@ class CollectionResponse(BaseModel):
     shared: bool
     created_at: datetime
     updated_at: datetime
+    version: int
 
 
 # ── Search ────────────────────────────────────────────────────────────────────
@@ -198,15 +239,152 @@ class SearchResult(BaseModel):
     result_type: str           # "source" | "note" | "insight"
     id: int
     title: Optional[str]      # sources and insights have titles
-    content: Optional[str]    # notes and insights have content
+    content: Optional[str]    # full text, with full_content=true
     topic_id: Optional[int]
     created_at: datetime
+    score: Optional[float] = None   # fuzzy mode: similarity x recency
+    snippet: Optional[str] = None   # highlighted HTML excerpt, unless full_content=true
 
 
 class SearchResponse(BaseModel):
     query: str
     total: int
     results: List[SearchResult]
+    facets: Optional[Dict[str, Dict[str, int]]] = None   # facet -> value -> hits, when asked for
+
+
+# ── Suggestions ───────────────────────────────────────────────────────────────
+
+class Suggestion(BaseModel):
+    id: int
+    text: str
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    topics: List[Suggestion]
+    sources: List[Suggestion]
+    insights: List[Suggestion]
+    authors: List[str]
+    tags: List[str]
+
+
+# ── Saved searches ────────────────────────────────────────────────────────────
+
+class SavedSearchFilters(BaseModel):
+    result_type: Optional[Literal["source", "note", "insight"]] = None
+    topic_id: Optional[int] = None
+    credibility: Optional[str] = None   # sources only
+    status: Optional[str] = None        # insights only
+
+
+class SavedSearchCreate(BaseModel):
+    name: str
+    q: str = Field(..., min_length=1, max_length=500)
+    mode: Literal["exact", "fuzzy"] = "exact"
+    threshold: Optional[float] = Field(None, gt=0, le=1)
+    filters: SavedSearchFilters = SavedSearchFilters()
+    owner: Optional[str] = None
+
+
+class SavedSearchUpdate(BaseModel):
+    name: Optional[str] = None
+    q: Optional[str] = Field(None, min_length=1, max_length=500)
+    mode: Optional[Literal["exact", "fuzzy"]] = None
+    threshold: Optional[float] = Field(None, gt=0, le=1)
+    filters: Optional[SavedSearchFilters] = None
+    owner: Optional[str] = None
+
+
+class SavedSearchResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    q: str
+    mode: str
+    threshold: Optional[float]
+    filters: SavedSearchFilters
+    owner: Optional[str]
+    last_run_at: Optional[datetime]
+    created_at: datetime
+    updated_at: datetime
+    version: int
+
+
+class SavedSearchHitResponse(SearchResult):
+    found_at: datetime
+
+
+class SavedSearchHitsResponse(BaseModel):
+    hits: List[SavedSearchHitResponse]
+    next_token: str
+    has_more: bool
+
+
+# ── Batch get ─────────────────────────────────────────────────────────────────
+
+class BatchGetRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class BatchGetResponse(BaseModel, Generic[T]):
+    items: List[T]             # in the requested order, duplicates collapsed
+    missing: List[int]
+
+
+# ── Bulk write ────────────────────────────────────────────────────────────────
+
+class BulkWriteResponse(BaseModel):
+    matched: int        # rows written, or rows that would be with dry_run
+    dry_run: bool
+
+
+# ── Change feed ───────────────────────────────────────────────────────────────
+
+class ChangeResponse(BaseModel):
+    id: int
+    entity: str                # "topic" | "source" | "note" | "insight" | "collection"
+    entity_id: int
+    op: str                    # "create" | "update" | "delete"
+    topic_id: Optional[int]
+    changed_at: datetime
+    data: Optional[Any] = None  # current state of the row; null once it is deleted
+
+
+class ChangeFeedResponse(BaseModel):
+    changes: List[ChangeResponse]
+    next_token: str
+    has_more: bool
+
+
+# ── Activity ──────────────────────────────────────────────────────────────────
+
+class ActivityPoint(BaseModel):
+    period: date                      # first day of the bucket (Monday for weeks)
+    metric: str                       # sources_added / notes_written / insights_validated
+    topic_id: Optional[int] = None    # set when grouped by topic
+    author: Optional[str] = None      # set when grouped by author
+    count: int
+
+
+# ── Jobs ──────────────────────────────────────────────────────────────────────
+
+class JobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    kind: str
+    params: Optional[Dict[str, Any]]
+    status: str
+    done: Optional[int]
+    total: Optional[int]
+    result: Optional[Any]
+    error: Optional[str]
+    attempts: Optional[int]
+    created_at: Optional[datetime]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
 
 
 # ── Dashboard ─────────────────────────────────────────────────────────────────
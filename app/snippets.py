@@ -0,0 +1,76 @@
+"""Highlighted snippets of search hits.
+
+A snippet is a window of about ``SEARCH_SNIPPET_LENGTH`` characters (default
+200) around the first match in a text, cut at word boundaries, with ``…``
+where text was cut. It is HTML: the text is escaped and every match inside
+the window is wrapped in ``<mark>``. Exact queries mark occurrences of the
+query; fuzzy queries mark words similar enough to one of the query's words.
+A text that does not match at all (the hit matched on its title) gives its
+opening window, unmarked.
+
+The scan stops at the first match, so the cost is bounded by how far into
+the text that match lies, not by the text's length.
+"""
+import html
+import os
+import re
+from typing import Iterator, List, Optional, Tuple
+
+from app.fuzzy import trigrams
+
+SNIPPET_LENGTH = int(os.getenv("SEARCH_SNIPPET_LENGTH", "200"))
+
+_WORD = re.compile(r"\w+")
+
+
+def _exact_spans(text: str, q: str) -> Iterator[Tuple[int, int]]:
+    for found in re.finditer(re.escape(q), text, re.IGNORECASE):
+        yield found.span()
+
+
+def _fuzzy_spans(text: str, q: str, threshold: float) -> Iterator[Tuple[int, int]]:
+    # A word matches when it holds ``threshold`` of some query word's trigrams
+    wanted = [grams for grams in (trigrams(word) for word in q.split()) if grams]
+    for found in _WORD.finditer(text):
+        word = found.group().lower()
+        if any(sum(gram in word for gram in grams) >= threshold * len(grams) for grams in wanted):
+            yield found.span()
+
+
+def _window(text: str, start: int, end: int, length: int) -> Tuple[int, int]:
+    lo = max(0, min(start - (length - (end - start)) // 2, len(text) - length))
+    hi = min(len(text), max(lo + length, end))
+    if lo > 0:
+        space = text.find(" ", lo, start)
+        lo = space + 1 if space != -1 else lo
+    if hi < len(text):
+        space = text.rfind(" ", end, hi)
+        hi = space if space != -1 else hi
+    return lo, hi
+
+
+def snippet(
+    text: Optional[str], q: str, threshold: Optional[float] = None, length: int = SNIPPET_LENGTH
+) -> Optional[str]:
+    """Highlighted window of ``text`` around ``q``; fuzzy matching when ``threshold`` is given."""
+    if not text:
+        return text
+
+    def spans(within: str) -> Iterator[Tuple[int, int]]:
+        if threshold is None:
+            return _exact_spans(within, q)
+        return _fuzzy_spans(within, q, threshold)
+
+    first = next(spans(text), None)
+    lo, hi = _window(text, *first, length) if first else _window(text, 0, 0, length)
+
+    window = text[lo:hi]
+    parts: List[str] = ["…"] if lo > 0 else []
+    pos = 0
+    for start, end in spans(window):
+        parts += [html.escape(window[pos:start]), "<mark>", html.escape(window[start:end]), "</mark>"]
+        pos = end
+    parts.append(html.escape(window[pos:]))
+    if hi < len(text):
+        parts.append("…")
+    return "".join(parts)
@@ -0,0 +1,72 @@
+"""Per-topic scorecards built from grouped aggregates.
+
+Whatever the number of topics, a scorecard costs one ``GROUP BY`` query per
+child table (sources, insights, notes), each restricted to the requested
+topic ids so the ``topic_id`` indexes do the work.
+"""
+from collections import defaultdict
+from typing import Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Grouping key used for rows whose category column is NULL
+UNSPECIFIED = "unspecified"
+
+
+def _latest(*values):
+    present = [v for v in values if v is not None]
+    return max(present) if present else None
+
+
+def _empty(topic: models.Topic) -> dict:
+    return {
+        "topic_id": topic.id,
+        "sources_total": 0,
+        "sources_by_type": defaultdict(int),
+        "sources_by_credibility": defaultdict(int),
+        "insights_total": 0,
+        "insights_by_status": defaultdict(int),
+        "insight_matrix": defaultdict(lambda: defaultdict(int)),
+        "notes_total": 0,
+        "last_activity": topic.updated_at,
+    }
+
+
+def topic_stats(db: Session, topics: List[models.Topic]) -> List[dict]:
+    stats: Dict[int, dict] = {topic.id: _empty(topic) for topic in topics}
+    if not stats:
+        return []
+    ids = list(stats)
+
+    Source = models.Source
+    for topic_id, type_, credibility, count, latest in db.query(
+        Source.topic_id, Source.type, Source.credibility, func.count(), func.max(Source.updated_at),
+    ).filter(Source.topic_id.in_(ids)).group_by(Source.topic_id, Source.type, Source.credibility):
+        s = stats[topic_id]
+        s["sources_total"] += count
+        s["sources_by_type"][type_ or UNSPECIFIED] += count
+        s["sources_by_credibility"][credibility or UNSPECIFIED] += count
+        s["last_activity"] = _latest(s["last_activity"], latest)
+
+    Insight = models.Insight
+    for topic_id, status, confidence, impact, count, latest in db.query(
+        Insight.topic_id, Insight.status, Insight.confidence, Insight.impact, func.count(), func.max(Insight.updated_at),
+    ).filter(Insight.topic_id.in_(ids)).group_by(Insight.topic_id, Insight.status, Insight.confidence, Insight.impact):
+        s = stats[topic_id]
+        s["insights_total"] += count
+        s["insights_by_status"][status or UNSPECIFIED] += count
+        s["insight_matrix"][confidence or UNSPECIFIED][impact or UNSPECIFIED] += count
+        s["last_activity"] = _latest(s["last_activity"], latest)
+
+    Note = models.Note
+    for topic_id, count, latest in db.query(
+        Note.topic_id, func.count(), func.max(Note.updated_at),
+    ).filter(Note.topic_id.in_(ids)).group_by(Note.topic_id):
+        s = stats[topic_id]
+        s["notes_total"] = count
+        s["last_activity"] = _latest(s["last_activity"], latest)
+
+    return [stats[topic.id] for topic in topics]
@@ -0,0 +1,308 @@
+"""Typeahead suggestions: topic names, source and insight titles, authors, tags.
+
+Every lookup is bounded by the number of suggestions asked for, so its cost
+does not grow with the table.
+
+On Postgres, ``pg_trgm`` GIN indexes on the title and author columns, and on
+the text of the ``tags`` arrays, serve prefix, substring and -- for
+fragments of three or more characters -- similarity (typo-tolerant)
+matches, in that order of preference.
+
+On SQLite, titles are matched by prefix through ``NOCASE`` indexes and by
+substring through the FTS5 trigram indexes of ``app.fts``. Authors and tags
+live in JSON arrays and scattered columns no SQLite index can serve, so they
+are held in small in-memory vocabularies, loaded at startup and extended by
+every committed write. A term stays suggestable until the next restart after
+its last use is removed.
+"""
+import bisect
+import math
+import threading
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Text, case, cast, event, func, literal, literal_column, select, text, union
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import fts, fuzzy, models
+from app.database import SessionLocal
+
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 20
+_SCAN_LIMIT = 200          # terms read per column, or per trigram posting, when collecting authors and tags
+_FUZZY_MIN_LENGTH = 3
+_INSORT_LIMIT = 64         # batches up to this size are inserted one by one, larger ones merged
+
+TITLES = {
+    "topics": (models.Topic, "name"),
+    "sources": (models.Source, "title"),
+    "insights": (models.Insight, "title"),
+}
+AUTHOR_COLUMNS = (models.Source.author, models.Note.author, models.Insight.author)
+TAG_COLUMNS = (models.Topic.tags, models.Note.tags)
+
+_dialect: Optional[str] = None
+
+
+class Vocabulary:
+    """Sorted in-memory terms, matched by prefix of the term or of any word in it.
+
+    Substring and typo matches look their candidates up in a trigram index, as
+    ``app.fuzzy`` does on SQLite, so no lookup walks every term. Writers replace
+    the key list and each trigram's posting set rather than mutate them, and
+    add terms before indexing them, so readers need no lock.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []        # (lowercased key, term), sorted
+        self._terms: Dict[str, str] = {}              # lowercased term -> term
+        self._grams: Dict[str, FrozenSet[str]] = {}   # trigram -> lowercased terms containing it
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @staticmethod
+    def _word_starts(lowered: str) -> Iterable[str]:
+        yield lowered
+        for i, ch in enumerate(lowered[:-1]):
+            if not ch.isalnum() and lowered[i + 1].isalnum():
+                yield lowered[i + 1:]
+
+    def update(self, terms: Iterable[str]) -> None:
+        with self._lock:
+            new = {
+                term.lower(): term for term in terms
+                if isinstance(term, str) and term and term.lower() not in self._terms
+            }
+            if not new:
+                return
+            keys = [(key, term) for lowered, term in new.items() for key in self._word_starts(lowered)]
+            if len(keys) <= _INSORT_LIMIT:
+                merged = list(self._keys)
+                for key in keys:
+                    bisect.insort(merged, key)
+            else:
+                # Two sorted runs: timsort merges them in one linear pass
+                merged = self._keys + sorted(keys)
+                merged.sort()
+            postings: Dict[str, Set[str]] = {}
+            for lowered in new:
+                for gram in fuzzy.trigrams(lowered):
+                    postings.setdefault(gram, set()).add(lowered)
+            self._terms.update(new)
+            for gram, added in postings.items():
+                self._grams[gram] = self._grams.get(gram, frozenset()) | added
+            self._keys = merged
+
+    def _candidates(self, grams: Iterable[str]) -> Iterable[str]:
+        """Terms containing any of ``grams``, at most ``_SCAN_LIMIT`` of them."""
+        seen: Set[str] = set()
+        for gram in grams:
+            for lowered in islice(self._grams.get(gram, ()), _SCAN_LIMIT - len(seen)):
+                if lowered not in seen:
+                    seen.add(lowered)
+                    yield lowered
+            if len(seen) >= _SCAN_LIMIT:
+                return
+
+    def search(self, q: str, limit: int) -> List[str]:
+        prefix = q.lower()
+        keys = self._keys
+        starts_term: Dict[str, bool] = {}
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and len(starts_term) < _SCAN_LIMIT and keys[i][0].startswith(prefix):
+            key, term = keys[i]
+            starts_term[term] = starts_term.get(term, False) or key == term.lower()
+            i += 1
+        # Whole-term prefix matches first, then word-start matches
+        ranked = sorted(starts_term, key=lambda term: (not starts_term[term], len(term), term.lower()))[:limit]
+        grams = fuzzy.trigrams(prefix)
+        if len(ranked) >= limit or len(prefix) < _FUZZY_MIN_LENGTH or not grams:
+            return ranked
+        rarest = sorted(grams, key=lambda gram: len(self._grams.get(gram, ())))
+        # A substring holds every trigram of q, so the rarest one's terms are the only candidates
+        inside = [self._terms[lowered] for lowered in self._candidates(rarest[:1]) if prefix in lowered]
+        ranked += sorted(
+            (term for term in inside if term not in starts_term), key=lambda term: (len(term), term.lower())
+        )
+        # Typos: a term sharing m of q's n trigrams holds one of the rarest n - m + 1
+        needed = math.ceil(fuzzy.DEFAULT_THRESHOLD * len(grams))
+        shared = {
+            lowered: sum(gram in lowered for gram in grams)
+            for lowered in self._candidates(rarest[:len(grams) - needed + 1])
+        }
+        close = sorted((lowered for lowered, n in shared.items() if n >= needed),
+                       key=lambda lowered: (-shared[lowered], len(lowered), lowered))
+        ranked += [self._terms[lowered] for lowered in close if self._terms[lowered] not in ranked]
+        return ranked[:limit]
+
+
+authors = Vocabulary()
+tags = Vocabulary()
+
+
+# ── Installation ──────────────────────────────────────────────────────────────
+
+def _index_name(model, name: str, kind: str) -> str:
+    return f"ix_{model.__tablename__}_{name}_{kind}"
+
+
+def install(engine: Engine) -> None:
+    """Create the indexes suggestions rely on and, on SQLite, load the vocabularies."""
+    global _dialect
+    _dialect = engine.dialect.name
+    if _dialect == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for model, name in TITLES.values():
+                table = model.__tablename__
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {_index_name(model, name, 'trgm')} "
+                    f"ON {table} USING gin ({name} gin_trgm_ops)"
+                ))
+            for col in AUTHOR_COLUMNS + TAG_COLUMNS:
+                model, name = col.class_, col.key
+                expr = f"({name}::text)" if col in TAG_COLUMNS else name
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {_index_name(model, name, 'trgm')} "
+                    f"ON {model.__tablename__} USING gin ({expr} gin_trgm_ops)"
+                ))
+        return
+    if _dialect == "sqlite":
+        with engine.begin() as conn:
+            for model, name in TITLES.values():
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {_index_name(model, name, 'nocase')} "
+                    f"ON {model.__tablename__} ({name} COLLATE NOCASE)"
+                ))
+    with engine.connect() as conn:
+        for col in AUTHOR_COLUMNS:
+            authors.update(conn.execute(select(col).where(col.isnot(None)).distinct()).scalars())
+        for col in TAG_COLUMNS:
+            tags.update(tag for row in conn.execute(select(col)).scalars() for tag in row or ())
+
+
+# ── Lookups ───────────────────────────────────────────────────────────────────
+
+def _titles(db: Session, model, name: str, q: str, limit: int) -> List[dict]:
+    column = getattr(model, name)
+    found: Dict[int, str] = {}
+
+    def take(criterion, order=None):
+        stmt = select(model.id, column).where(criterion)
+        if found:
+            stmt = stmt.where(model.id.notin_(list(found)))
+        if order is not None:
+            stmt = stmt.order_by(order)
+        for row_id, value in db.execute(stmt.limit(limit - len(found))):
+            found[row_id] = value
+
+    escaped = fts.like_escape(q)
+    if _dialect == "postgresql":
+        take(column.ilike(f"{escaped}%", escape="\\"))
+        if len(found) < limit:
+            take(column.ilike(f"%{escaped}%", escape="\\"))
+        if len(found) < limit and len(q) >= _FUZZY_MIN_LENGTH:
+            take(column.op("%")(q), func.similarity(column, q).desc())
+    else:
+        nocase = column.collate("NOCASE")
+        take(nocase.between(literal(q), literal(q + "\U0010ffff")), nocase)
+        if len(found) < limit and len(q) >= fts.MIN_QUERY_LENGTH:
+            take(fts.text_filter(db, model, q, columns=(name,)))
+    return [{"id": row_id, "text": value} for row_id, value in found.items()]
+
+
+def _pg_terms(db: Session, columns, q: str, limit: int, tag_lists: bool) -> List[str]:
+    escaped = fts.like_escape(q)
+    found: List[str] = []
+
+    def take(pattern: str, row_pattern: str):
+        stmts = []
+        for col in columns:
+            if tag_lists:
+                # The indexed array text narrows the rows; the unnested tags decide the match
+                array = case((func.json_typeof(col) == "array", col), else_=literal_column("'[]'::json"))
+                term = func.json_array_elements_text(array).column_valued("term")
+                stmt = select(term).select_from(col.class_).where(cast(col, Text).ilike(row_pattern, escape="\\"))
+            else:
+                term = col.label("term")
+                stmt = select(term)
+            stmt = stmt.where(term.ilike(pattern, escape="\\"))
+            if found:
+                stmt = stmt.where(term.notin_(found))
+            stmts.append(stmt.distinct().limit(_SCAN_LIMIT))
+        terms = union(*stmts).subquery()
+        ranked = select(terms.c.term).order_by(func.length(terms.c.term), func.lower(terms.c.term))
+        found.extend(db.execute(ranked.limit(limit - len(found))).scalars())
+
+    # Serialised arrays look like ["a", "b"]: a tag starting with q follows a quote
+    take(f"{escaped}%", f'%"{escaped}%')
+    if len(found) < limit:
+        take(f"%{escaped}%", f"%{escaped}%")
+    return found
+
+
+def suggest(db: Session, q: str, limit: int = DEFAULT_LIMIT) -> dict:
+    result = {kind: _titles(db, model, name, q, limit) for kind, (model, name) in TITLES.items()}
+    if _dialect == "postgresql":
+        result["authors"] = _pg_terms(db, AUTHOR_COLUMNS, q, limit, tag_lists=False)
+        result["tags"] = _pg_terms(db, TAG_COLUMNS, q, limit, tag_lists=True)
+    else:
+        result["authors"] = authors.search(q, limit)
+        result["tags"] = tags.search(q, limit)
+    return result
+
+
+# ── Keeping the vocabularies current ──────────────────────────────────────────
+
+def _pending(session: Session) -> Dict[str, Set[str]]:
+    return session.info.setdefault("suggest_terms", {"authors": set(), "tags": set()})
+
+
+def _collect(session: Session, obj) -> None:
+    author = getattr(obj, "author", None)
+    if isinstance(obj, (models.Source, models.Note, models.Insight)) and author:
+        _pending(session)["authors"].add(author)
+    if isinstance(obj, (models.Topic, models.Note)) and obj.tags:
+        _pending(session)["tags"].update(obj.tags)
+
+
+def record_bulk_update(session: Session, model, values: dict) -> None:
+    """Note the terms a set-based UPDATE writes, which the flush hooks never see."""
+    if _dialect in (None, "postgresql"):
+        return
+    if values.get("author") and model in (models.Source, models.Note, models.Insight):
+        _pending(session)["authors"].add(values["author"])
+    if values.get("tags") and model in (models.Topic, models.Note):
+        _pending(session)["tags"].update(values["tags"])
+
+
+def record_bulk_insert(session: Session, model, rows) -> None:
+    """Note the terms a set-based INSERT writes, which the flush hooks never see."""
+    if _dialect in (None, "postgresql"):
+        return
+    for row in rows:
+        record_bulk_update(session, model, row)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capture_terms(session, flush_context):
+    if _dialect in (None, "postgresql"):
+        return
+    for obj in list(session.new) + list(session.dirty):
+        _collect(session, obj)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_terms(session):
+    pending = session.info.pop("suggest_terms", None)
+    if pending:
+        authors.update(pending["authors"])
+        tags.update(pending["tags"])
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_terms(session, previous_transaction):
+    session.info.pop("suggest_terms", None)
@@ -0,0 +1,47 @@
+"""Per-request SQL tracing surfaced as a ``Server-Timing`` response header.
+
+The statements themselves are captured by the engine hooks in
+``app.database``; this middleware owns the request's query log, reports it
+to the client and logs the heaviest statements at DEBUG level.
+"""
+import logging
+import time
+
+from app.database import query_log_context
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with query_log_context() as queries:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    total_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries", '
+                        f"app;dur={total_ms:.1f}"
+                    )
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"server-timing", timing.encode("latin-1")),
+                    ]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+            if logger.isEnabledFor(logging.DEBUG) and queries.count:
+                logger.debug(
+                    "%s %s: %d queries in %.1f ms", scope["method"], scope["path"],
+                    queries.count, queries.duration * 1000,
+                )
+                for fp, count, duration in queries.top():
+                    logger.debug("  %4d× %8.1f ms  %s", count, duration * 1000, fp)
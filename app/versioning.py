@@ -0,0 +1,55 @@
+"""Optimistic concurrency control.
+
+Every user-editable model has an integer ``version``, mapped as SQLAlchemy's
+``version_id_col``: each ORM update or delete is issued as
+``... WHERE id = :id AND version = :v`` and bumps the version, and finds no
+row -- raising ``StaleDataError``, answered ``412`` -- when another writer
+got there first. No row lock is held across the request. Set-based bulk
+updates (``app.bulk``) bump the version in the same statement.
+
+Single-resource responses carry the version as an ``ETag``. A ``PATCH`` or
+``DELETE`` sent with ``If-Match`` is refused with ``412`` unless it names the
+current version, so a client editing what it read cannot overwrite a change
+it has not seen.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app import models
+
+VERSIONED = (models.Topic, models.Source, models.Note, models.Insight, models.Collection, models.SavedSearch)
+
+
+def install(engine: Engine) -> None:
+    """Add the ``version`` column to tables created before it existed."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for model in VERSIONED:
+            table = model.__tablename__
+            if "version" not in {col["name"] for col in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def etag(obj) -> str:
+    return f'"{obj.version}"'
+
+
+def set_etag(response: Response, obj) -> None:
+    response.headers["ETag"] = etag(obj)
+
+
+def check_if_match(obj, if_match: Optional[str]) -> None:
+    """Raise ``412`` unless ``if_match`` is absent, ``*`` or lists the object's current ETag."""
+    if if_match is None or if_match.strip() == "*":
+        return
+    # Versions are exact, so a weak W/ prefix compares like a strong tag
+    tags = {tag.strip().removeprefix("W/") for tag in if_match.split(",")}
+    if etag(obj) not in tags:
+        raise HTTPException(
+            status_code=412,
+            detail="Precondition failed: the resource has changed since it was read",
+            headers={"ETag": etag(obj)},
+        )
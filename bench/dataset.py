@@ -0,0 +1,152 @@
+"""Synthetic corpus used by the benchmark harness.
+
+``app`` is imported lazily: the harness must set DATABASE_URL before the
+engine in ``app.database`` is created.
+"""
+import random
+from datetime import date, datetime, timedelta
+
+WORDS = (
+    "adoption agentic analytics battery benchmark capex carbon cloud compliance "
+    "compute customer data deployment edge energy enterprise forecast governance "
+    "grid hardware hydrogen inference infrastructure latency learning lithium "
+    "market model network optimisation pipeline platform policy pricing quantum "
+    "regulation revenue robotics security semiconductor software solar storage "
+    "strategy supply survey talent training vendor workflow"
+).split()
+
+AUTHORS = [f"analyst{i}@example.com" for i in range(12)]
+CATEGORIES = ["market", "technical", "competitive", "academic", "industry"]
+SOURCE_TYPES = ["article", "paper", "report", "video", "podcast", "book", "other"]
+LEVELS = ["low", "medium", "high"]
+TOPIC_STATUSES = ["active", "active", "active", "paused", "completed"]
+INSIGHT_STATUSES = ["hypothesis", "validated", "actionable", "archived"]
+
+
+def words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def populate(
+    db,
+    rng: random.Random,
+    topics: int = 50,
+    sources_per_topic: int = 20,
+    notes_per_topic: int = 30,
+    insights_per_topic: int = 8,
+    collections: int = 20,
+    saved_searches: int = 20,
+) -> None:
+    from app import models
+
+    now = datetime.utcnow()
+
+    def stamp() -> datetime:
+        return now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+
+    topic_rows = []
+    for _ in range(topics):
+        created = stamp()
+        topic_rows.append(models.Topic(
+            name=words(rng, 3).title(),
+            description=words(rng, 20),
+            status=rng.choice(TOPIC_STATUSES),
+            owner=rng.choice(AUTHORS),
+            category=rng.choice(CATEGORIES),
+            tags=rng.sample(WORDS, 3),
+            created_at=created,
+            updated_at=created,
+        ))
+    db.add_all(topic_rows)
+    db.flush()
+
+    source_rows = []
+    for topic in topic_rows:
+        for _ in range(sources_per_topic):
+            created = stamp()
+            source_rows.append(models.Source(
+                topic_id=topic.id,
+                title=words(rng, 6).capitalize(),
+                url=f"https://example.com/{rng.getrandbits(48):x}",
+                type=rng.choice(SOURCE_TYPES),
+                author=rng.choice(AUTHORS),
+                publication=words(rng, 2).title(),
+                published_date=date.today() - timedelta(days=rng.randint(0, 2000)),
+                # Roughly one source in ten is still waiting for review
+                summary=words(rng, 60) if rng.random() > 0.1 else None,
+                key_findings=[words(rng, 10) for _ in range(3)],
+                credibility=rng.choice(LEVELS),
+                added_by=rng.choice(AUTHORS),
+                created_at=created,
+                updated_at=created,
+            ))
+    db.add_all(source_rows)
+    db.flush()
+
+    note_rows = []
+    for topic in topic_rows:
+        for _ in range(notes_per_topic):
+            created = stamp()
+            note_rows.append(models.Note(
+                topic_id=topic.id,
+                source_id=rng.choice(source_rows).id,
+                content=words(rng, 80),
+                author=rng.choice(AUTHORS),
+                tags=rng.sample(WORDS, 2),
+                created_at=created,
+                updated_at=created,
+            ))
+    db.add_all(note_rows)
+
+    insight_rows = []
+    for topic in topic_rows:
+        for _ in range(insights_per_topic):
+            created = stamp()
+            insight_rows.append(models.Insight(
+                topic_id=topic.id,
+                title=words(rng, 8).capitalize(),
+                content=words(rng, 50),
+                evidence=[words(rng, 8) for _ in range(2)],
+                confidence=rng.choice(LEVELS),
+                impact=rng.choice(LEVELS),
+                status=rng.choice(INSIGHT_STATUSES),
+                author=rng.choice(AUTHORS),
+                created_at=created,
+                updated_at=created,
+            ))
+    db.add_all(insight_rows)
+    db.flush()
+
+    sources_by_topic = {}
+    for source in source_rows:
+        sources_by_topic.setdefault(source.topic_id, []).append(source)
+    db.add_all(
+        models.InsightEvidence(insight_id=insight.id, source_id=source.id, quote=words(rng, 12))
+        for insight in insight_rows
+        for source in rng.sample(sources_by_topic[insight.topic_id], min(2, sources_per_topic))
+    )
+
+    collection_rows = []
+    for _ in range(collections):
+        created = stamp()
+        collection_rows.append(models.Collection(
+            name=words(rng, 3).title(),
+            description=words(rng, 15),
+            topic_ids=[t.id for t in rng.sample(topic_rows, min(3, len(topic_rows)))],
+            source_ids=[s.id for s in rng.sample(source_rows, min(10, len(source_rows)))],
+            created_by=rng.choice(AUTHORS),
+            shared=rng.random() > 0.5,
+            created_at=created,
+            updated_at=created,
+        ))
+    db.add_all(collection_rows)
+    db.add_all(
+        models.SavedSearch(
+            name=f"Saved search {i}",
+            owner=rng.choice(AUTHORS),
+            q=rng.choice(WORDS),
+            filters={"topic_id": rng.choice(topic_rows).id} if rng.random() < 0.3 else {},
+        )
+        for i in range(saved_searches)
+    )
+    db.commit()
@@ -0,0 +1,140 @@
+"""Bytes on the wire and encoding CPU cost per route.
+
+Replays every ``GET`` benchmark operation against a seeded corpus, keeps the
+uncompressed bodies, and for each route reports the average body size as JSON
+and as MessagePack, compressed with every available coding, plus the CPU
+time each encoding step costs per response. Use it to pick
+``COMPRESSION_ENCODINGS``, ``COMPRESSION_MIN_BYTES`` and the compression
+levels for a given link.
+
+    python -m bench.encoding
+    python -m bench.encoding --samples 50 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from bench.run import NOT_BENCHMARKED, configure_environment, seed_state
+from bench.scenarios import OPS
+
+# Skipped: liveness probe, and streams with no single body to measure
+_SKIP = NOT_BENCHMARKED | {"GET /health"}
+
+
+def _codecs() -> Dict[str, Callable[[bytes], bytes]]:
+    from app import encoding
+
+    def one_shot(factory):
+        def compress(body: bytes) -> bytes:
+            encoder = factory()
+            return encoder.compress(body) + encoder.finish()
+        return compress
+
+    return {name: one_shot(factory) for name, factory in encoding.ENCODERS.items()}
+
+
+def _cpu_us(fn, arg, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.process_time() - started) / repeat * 1e6
+
+
+def measure(bodies: List[Tuple[str, bytes]], repeat: int) -> dict:
+    from app.encoding import msgpack
+
+    codecs = _codecs()
+    totals: Dict[str, float] = defaultdict(float)
+    for content_type, body in bodies:
+        fmt = "json" if content_type.startswith("application/json") else content_type.split("/")[-1].split(";")[0]
+        variants = {fmt: body}
+        if msgpack is not None and fmt == "json":
+            transcode = lambda raw: msgpack.packb(json.loads(raw), use_bin_type=True)  # noqa: E731
+            variants["msgpack"] = transcode(body)
+            totals["msgpack_us"] += _cpu_us(transcode, body, repeat)
+        for variant, payload in variants.items():
+            totals[f"{variant}_bytes"] += len(payload)
+            for name, compress in codecs.items():
+                totals[f"{variant}+{name}_bytes"] += len(compress(payload))
+                totals[f"{variant}+{name}_us"] += _cpu_us(compress, payload, repeat)
+    return {key: round(value / len(bodies), 1) for key, value in sorted(totals.items())}
+
+
+async def collect(samples: int, rng: random.Random, state) -> Dict[str, List[Tuple[str, bytes]]]:
+    import httpx
+    from app import main
+
+    app = main.app
+    app.dependency_overrides[main.require_auth] = lambda: None
+    headers = {"X-API-Token": os.getenv("GDEV_API_TOKEN", "dev-token"), "Accept-Encoding": "identity"}
+    bodies: Dict[str, List[Tuple[str, bytes]]] = defaultdict(list)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        for op in OPS.values():
+            if op.method != "GET" or op.label in _SKIP:
+                continue
+            for _ in range(samples):
+                request = op.build(state, rng)
+                if request is None:
+                    break
+                resp = await client.get(**request)
+                if resp.status_code == 200:
+                    bodies[op.label].append((resp.headers.get("content-type", ""), resp.content))
+    return bodies
+
+
+def print_report(results: Dict[str, dict]) -> None:
+    columns = sorted({key for r in results.values() for key in r if key.endswith("_bytes")})
+    columns = sorted(columns, key=lambda k: (k.split("+")[0].replace("_bytes", ""), "+" in k, k))
+    cpu = sorted({key for r in results.values() for key in r if key.endswith("_us")})
+    print("\nAverage body size in bytes")
+    print(f"{'route':<46}" + "".join(f"{c[:-6]:>14}" for c in columns))
+    for label, r in results.items():
+        print(f"{label:<46}" + "".join(f"{r.get(c, '-'):>14}" for c in columns))
+    print("\nAverage CPU per response in microseconds")
+    print(f"{'route':<46}" + "".join(f"{c[:-3]:>14}" for c in cpu))
+    for label, r in results.items():
+        print(f"{label:<46}" + "".join(f"{r.get(c, '-'):>14}" for c in cpu))
+
+
+async def main_async(args) -> int:
+    from app import main
+
+    rng = random.Random(args.seed)
+    async with main.app.router.lifespan_context(main.app):
+        state = seed_state(args.topics, rng)
+        bodies = await collect(args.samples, rng, state)
+    results = {label: measure(samples, args.repeat) for label, samples in sorted(bodies.items())}
+    print_report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--samples", type=int, default=20, help="responses captured per route")
+    parser.add_argument("--repeat", type=int, default=5, help="encodings timed per response")
+    parser.add_argument("--topics", type=int, default=50, help="topics to seed (each with sources, notes, insights)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--database-url", help="overrides DATABASE_URL (default: temporary SQLite file)")
+    parser.add_argument("--json", help="write raw results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment(args.database_url)
+    print(f"Measuring encodings against {os.environ['DATABASE_URL']}")
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Fuzzy search latency against exact search.
+
+For each sampled corpus word, times ``/search`` for the word itself in exact
+mode and for a misspelling of it (one letter replaced, dropped, doubled or
+swapped) in fuzzy mode, and reports both latency distributions, their ratio,
+and how many of the exact hits the misspelt fuzzy query still finds. Exits
+non-zero when fuzzy p50 or p95 is more than ``--max-ratio`` times exact.
+
+    python -m bench.fuzzy
+    python -m bench.fuzzy --samples 200 --topics 200 --max-ratio 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from typing import Dict, List
+
+from bench.dataset import WORDS
+from bench.run import configure_environment, percentile, seed_state
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(("replace", "drop", "double", "swap"))
+    if edit == "replace":
+        return word[:i] + rng.choice([c for c in string.ascii_lowercase if c != word[i]]) + word[i + 1:]
+    if edit == "drop":
+        return word[:i] + word[i + 1:]
+    if edit == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+async def run(samples: int, rng: random.Random) -> Dict[str, List[float]]:
+    import httpx
+    from app import main
+
+    headers = {"X-API-Token": os.getenv("GDEV_API_TOKEN", "dev-token")}
+    timings: Dict[str, List[float]] = {"exact": [], "fuzzy": [], "recall": []}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def timed(params):
+            started = time.perf_counter()
+            resp = await client.get("/api/v1/search", params={**params, "limit": 1})
+            resp.raise_for_status()
+            return (time.perf_counter() - started) * 1000, resp.json()
+
+        for _ in range(samples):
+            word = rng.choice([w for w in WORDS if len(w) >= 5])
+            exact_ms, exact = await timed({"q": word})
+            fuzzy_ms, fuzzy = await timed({"q": misspell(word, rng), "mode": "fuzzy"})
+            timings["exact"].append(exact_ms)
+            timings["fuzzy"].append(fuzzy_ms)
+            if exact["total"]:
+                timings["recall"].append(min(fuzzy["total"] / exact["total"], 1.0))
+    return timings
+
+
+async def main_async(args) -> int:
+    from app import main
+
+    rng = random.Random(args.seed)
+    async with main.app.router.lifespan_context(main.app):
+        seed_state(args.topics, rng)
+        await run(min(args.samples, 10), rng)   # warm caches
+        timings = await run(args.samples, rng)
+
+    exact, fuzzy = sorted(timings["exact"]), sorted(timings["fuzzy"])
+    print(f"\n{'mode':<8}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, values in (("exact", exact), ("fuzzy", fuzzy)):
+        print(f"{name:<8}{len(values):>6}" + "".join(f"{percentile(values, p):>10.2f}" for p in (50, 95, 99)))
+    ratios = {p: percentile(fuzzy, p) / max(percentile(exact, p), 1e-9) for p in (50, 95)}
+    recall = sum(timings["recall"]) / len(timings["recall"]) if timings["recall"] else 0.0
+    print(f"\nfuzzy/exact: p50 {ratios[50]:.2f}x, p95 {ratios[95]:.2f}x; "
+          f"misspelt queries find {recall:.0%} as many results as the exact word")
+    if max(ratios.values()) > args.max_ratio:
+        print(f"FAIL: fuzzy search is more than {args.max_ratio}x slower than exact search")
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--samples", type=int, default=100, help="word pairs to time")
+    parser.add_argument("--topics", type=int, default=50, help="topics to seed (each with sources, notes, insights)")
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="allowed fuzzy/exact latency ratio")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--database-url", help="overrides DATABASE_URL (default: temporary SQLite file)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment(args.database_url)
+    print(f"Timing fuzzy against exact search on {os.environ['DATABASE_URL']}")
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
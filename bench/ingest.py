@@ -0,0 +1,161 @@
+"""Sustained note-capture throughput: one commit per note against buffered groups.
+
+Reports notes per second two ways, each until every note is in the database
+(for buffered notes: committed by the flusher, not merely acknowledged):
+
+* ``write``: what the database side sustains. ``--notes`` notes committed one
+  transaction each, as ``POST /notes`` does, against the same notes queued
+  straight into the write-behind buffer. Each mode runs ``--rounds`` times,
+  alternating which goes first so neither always meets the larger table, and
+  the median rate of each is reported.
+* ``http``: end to end, ``--concurrency`` clients posting through the whole
+  ASGI stack with and without ``buffered=true``. Client and server share one
+  process and one GIL here, so this is bounded by request handling long
+  before the database; informational only.
+
+The 10x target is gated on ``write`` alone: that is the part the buffer
+changes, and the ``http`` figure measures this harness's client as much as
+the server. Exits non-zero when buffered write throughput is under
+``--min-ratio`` times one-commit-per-note.
+
+    python -m bench.ingest
+    python -m bench.ingest --notes 20000 --concurrency 64 --min-ratio 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+from bench.dataset import WORDS
+from bench.run import configure_environment
+
+
+def _note_body(rng: random.Random) -> dict:
+    return {"content": " ".join(rng.choices(WORDS, k=12)), "author": "bench", "tags": ["live"]}
+
+
+async def _until_written(tracking_id: str) -> None:
+    """Wait for the buffer to commit ``tracking_id``; groups are written in order, so everything before it too."""
+    from app import ingest
+
+    while ingest.buffer.status(tracking_id) == ("pending", None):
+        await asyncio.sleep(0.005)
+
+
+def _direct_rate(bodies: List[dict]) -> float:
+    from app import models
+    from app.database import SessionLocal
+
+    started = time.perf_counter()
+    for body in bodies:
+        db = SessionLocal()
+        try:
+            db.add(models.Note(**body))
+            db.commit()
+        finally:
+            db.close()
+    return len(bodies) / (time.perf_counter() - started)
+
+
+async def _buffered_rate(bodies: List[dict]) -> float:
+    from app import ingest
+
+    ingest.buffer.max_rows = max(ingest.buffer.max_rows, len(bodies))
+    started = time.perf_counter()
+    for body in bodies:
+        tracking_id = ingest.buffer.submit(body)
+    await _until_written(tracking_id)
+    return len(bodies) / (time.perf_counter() - started)
+
+
+async def write_rates(notes: int, rounds: int, rng: random.Random) -> dict:
+    direct, buffered = [], []
+    for i in range(rounds):
+        bodies = [_note_body(rng) for _ in range(notes)]
+        if i % 2:
+            buffered.append(await _buffered_rate(bodies))
+            direct.append(_direct_rate(bodies))
+        else:
+            direct.append(_direct_rate(bodies))
+            buffered.append(await _buffered_rate(bodies))
+    return {"direct": statistics.median(direct), "buffered": statistics.median(buffered)}
+
+
+async def http_rate(client, notes: int, concurrency: int, buffered: bool, rng: random.Random) -> float:
+    remaining = notes
+    last = None
+    params = {"buffered": "true"} if buffered else {}
+
+    async def poster():
+        nonlocal remaining, last
+        while remaining > 0:
+            remaining -= 1
+            body = _note_body(rng)
+            while True:
+                resp = await client.post("/api/v1/notes", params=params, json=body)
+                if resp.status_code != 503:
+                    break
+                await asyncio.sleep(0.01)   # backpressure: the buffer is full
+            resp.raise_for_status()
+            if buffered:
+                last = resp.json()["tracking_id"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(poster() for _ in range(concurrency)))
+    if last is not None:
+        await _until_written(last)
+    return notes / (time.perf_counter() - started)
+
+
+async def main_async(args) -> int:
+    import httpx
+    from app import main
+
+    rng = random.Random(args.seed)
+    headers = {"X-API-Token": os.getenv("GDEV_API_TOKEN", "dev-token")}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            await http_rate(client, min(args.notes, 200), args.concurrency, False, rng)   # warm up
+            rates = {"write": await write_rates(args.notes, args.rounds, rng)}
+            rates["http"] = {
+                "direct": await http_rate(client, args.http_notes, args.concurrency, False, rng),
+                "buffered": await http_rate(client, args.http_notes, args.concurrency, True, rng),
+            }
+
+    print(f"\n{'path':<8}{'direct/s':>10}{'buffered/s':>12}{'ratio':>8}")
+    for path, rate in rates.items():
+        ratio = rate["buffered"] / max(rate["direct"], 1e-9)
+        print(f"{path:<8}{rate['direct']:>10.0f}{rate['buffered']:>12.0f}{ratio:>7.1f}x")
+    write_ratio = rates["write"]["buffered"] / max(rates["write"]["direct"], 1e-9)
+    if write_ratio < args.min_ratio:
+        print(f"FAIL: buffered writes sustain less than {args.min_ratio}x one commit per note")
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=5000, help="notes to write in each mode of the write test")
+    parser.add_argument("--rounds", type=int, default=3, help="runs of each mode in the write test")
+    parser.add_argument("--http-notes", type=int, default=1000, help="notes to post in each mode of the http test")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent posting clients")
+    parser.add_argument("--min-ratio", type=float, default=10.0, help="required buffered/direct write throughput")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--database-url", help="overrides DATABASE_URL (default: temporary SQLite file)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment(args.database_url)
+    print(f"Timing note capture on {os.environ['DATABASE_URL']}")
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
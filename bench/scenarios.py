@@ -0,0 +1,469 @@
+"""Benchmark operations and the traffic mixes built from them.
+
+Every operation names the route template it exercises so results can be
+reported per route and checked against the application's route table.
+Reads and updates only touch the seeded corpus; deletes only remove rows
+the benchmark itself created, so no operation ever races into a 404.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bench.dataset import AUTHORS, CATEGORIES, INSIGHT_STATUSES, LEVELS, SOURCE_TYPES, WORDS, words
+
+API = "/api/v1"
+RESOURCES = ["topics", "sources", "notes", "insights", "collections"]
+
+
+@dataclass
+class State:
+    ids: Dict[str, List[int]] = field(default_factory=lambda: {r: [] for r in RESOURCES})
+    spare: Dict[str, List[int]] = field(default_factory=lambda: {r: [] for r in RESOURCES + ["jobs"]})
+
+
+@dataclass
+class Op:
+    name: str
+    method: str
+    route: str
+    build: Callable[[State, random.Random], Optional[dict]]
+    expect: Tuple[int, ...] = (200,)
+    creates: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.route}"
+
+
+OPS: Dict[str, Op] = {}
+
+
+def op(name: str, method: str, route: str, expect: Tuple[int, ...] = (200,), creates: Optional[str] = None):
+    def register(build):
+        OPS[name] = Op(name, method, route, build, expect, creates)
+        return build
+    return register
+
+
+def _pick(state: State, resource: str, rng: random.Random) -> int:
+    return rng.choice(state.ids[resource])
+
+
+def _pop_spare(state: State, resource: str) -> Optional[int]:
+    return state.spare[resource].pop() if state.spare[resource] else None
+
+
+def _days_ago(days: int) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).replace(microsecond=0).isoformat()
+
+
+# ── Unversioned pages ─────────────────────────────────────────────────────────
+
+@op("health", "GET", "/health")
+def _health(state, rng):
+    return {"url": "/health"}
+
+
+@op("root_dashboard", "GET", "/")
+def _root(state, rng):
+    return {"url": "/"}
+
+
+# ── Topics ────────────────────────────────────────────────────────────────────
+
+@op("list_topics", "GET", f"{API}/topics")
+def _list_topics(state, rng):
+    params = {"limit": 50}
+    if rng.random() < 0.5:
+        params["status"] = "active"
+    return {"url": f"{API}/topics", "params": params}
+
+
+@op("create_topic", "POST", f"{API}/topics", expect=(201,), creates="topics")
+def _create_topic(state, rng):
+    return {"url": f"{API}/topics", "json": {
+        "name": words(rng, 3).title(),
+        "description": words(rng, 20),
+        "owner": rng.choice(AUTHORS),
+        "category": rng.choice(CATEGORIES),
+        "tags": rng.sample(WORDS, 3),
+    }}
+
+
+@op("get_topic", "GET", f"{API}/topics/{{topic_id}}")
+def _get_topic(state, rng):
+    return {"url": f"{API}/topics/{_pick(state, 'topics', rng)}"}
+
+
+@op("update_topic", "PATCH", f"{API}/topics/{{topic_id}}")
+def _update_topic(state, rng):
+    return {"url": f"{API}/topics/{_pick(state, 'topics', rng)}", "json": {"description": words(rng, 20)}}
+
+
+@op("delete_topic", "DELETE", f"{API}/topics/{{topic_id}}", expect=(204,))
+def _delete_topic(state, rng):
+    topic_id = _pop_spare(state, "topics")
+    return {"url": f"{API}/topics/{topic_id}"} if topic_id else None
+
+
+@op("delete_topic_background", "DELETE", f"{API}/topics/{{topic_id}}", expect=(202,), creates="jobs")
+def _delete_topic_background(state, rng):
+    topic_id = _pop_spare(state, "topics")
+    return {"url": f"{API}/topics/{topic_id}", "params": {"background": True}} if topic_id else None
+
+
+@op("list_topic_stats", "GET", f"{API}/topics/stats")
+def _list_topic_stats(state, rng):
+    return {"url": f"{API}/topics/stats", "params": {"limit": 50}}
+
+
+@op("get_topic_stats", "GET", f"{API}/topics/{{topic_id}}/stats")
+def _get_topic_stats(state, rng):
+    return {"url": f"{API}/topics/{_pick(state, 'topics', rng)}/stats"}
+
+
+@op("list_topic_sources", "GET", f"{API}/topics/{{topic_id}}/sources")
+def _list_topic_sources(state, rng):
+    return {"url": f"{API}/topics/{_pick(state, 'topics', rng)}/sources"}
+
+
+@op("list_topic_insights", "GET", f"{API}/topics/{{topic_id}}/insights")
+def _list_topic_insights(state, rng):
+    return {"url": f"{API}/topics/{_pick(state, 'topics', rng)}/insights"}
+
+
+# ── Sources ───────────────────────────────────────────────────────────────────
+
+@op("list_sources", "GET", f"{API}/sources")
+def _list_sources(state, rng):
+    params = {"limit": 50}
+    roll = rng.random()
+    if roll < 0.3:
+        params["topic_id"] = _pick(state, "topics", rng)
+    elif roll < 0.5:
+        params["credibility"] = rng.choice(LEVELS)
+    return {"url": f"{API}/sources", "params": params}
+
+
+@op("create_source", "POST", f"{API}/sources", expect=(201,), creates="sources")
+def _create_source(state, rng):
+    return {"url": f"{API}/sources", "json": {
+        "topic_id": _pick(state, "topics", rng),
+        "title": words(rng, 6).capitalize(),
+        "url": f"https://example.com/{rng.getrandbits(48):x}",
+        "type": rng.choice(SOURCE_TYPES),
+        "author": rng.choice(AUTHORS),
+        "summary": words(rng, 60),
+        "key_findings": [words(rng, 10) for _ in range(3)],
+        "credibility": rng.choice(LEVELS),
+        "added_by": rng.choice(AUTHORS),
+    }}
+
+
+@op("get_source", "GET", f"{API}/sources/{{source_id}}")
+def _get_source(state, rng):
+    return {"url": f"{API}/sources/{_pick(state, 'sources', rng)}"}
+
+
+@op("update_source", "PATCH", f"{API}/sources/{{source_id}}")
+def _update_source(state, rng):
+    return {"url": f"{API}/sources/{_pick(state, 'sources', rng)}", "json": {"credibility": rng.choice(LEVELS)}}
+
+
+@op("delete_source", "DELETE", f"{API}/sources/{{source_id}}", expect=(204,))
+def _delete_source(state, rng):
+    source_id = _pop_spare(state, "sources")
+    return {"url": f"{API}/sources/{source_id}"} if source_id else None
+
+
+@op("list_source_insights", "GET", f"{API}/sources/{{source_id}}/insights")
+def _list_source_insights(state, rng):
+    return {"url": f"{API}/sources/{_pick(state, 'sources', rng)}/insights"}
+
+
+# ── Notes ─────────────────────────────────────────────────────────────────────
+
+@op("list_notes", "GET", f"{API}/notes")
+def _list_notes(state, rng):
+    params = {"limit": 50}
+    if rng.random() < 0.5:
+        params["topic_id"] = _pick(state, "topics", rng)
+    if rng.random() < 0.3:
+        params["created_after"] = _days_ago(90)
+    return {"url": f"{API}/notes", "params": params}
+
+
+@op("create_note", "POST", f"{API}/notes", expect=(201,), creates="notes")
+def _create_note(state, rng):
+    return {"url": f"{API}/notes", "json": {
+        "topic_id": _pick(state, "topics", rng),
+        "source_id": _pick(state, "sources", rng),
+        "content": words(rng, 80),
+        "author": rng.choice(AUTHORS),
+        "tags": rng.sample(WORDS, 2),
+    }}
+
+
+_last_keyed_note: Dict[str, dict] = {}
+
+
+@op("create_note_idempotent", "POST", f"{API}/notes", expect=(201, 409))
+def _create_note_idempotent(state, rng):
+    # An ingestion client sending Idempotency-Key; one in five requests is a retry of the previous one,
+    # which gets 409 if that is still running
+    if _last_keyed_note and rng.random() < 0.2:
+        return _last_keyed_note["request"]
+    request = _create_note(state, rng)
+    request["headers"] = {"Idempotency-Key": f"bench-{rng.getrandbits(64):016x}"}
+    _last_keyed_note["request"] = request
+    return request
+
+
+@op("create_note_buffered", "POST", f"{API}/notes", expect=(202,))
+def _create_note_buffered(state, rng):
+    # A live-capture integration: acknowledged at once, written later by the flusher
+    return {**_create_note(state, rng), "params": {"buffered": "true"}}
+
+
+@op("get_note", "GET", f"{API}/notes/{{note_id}}")
+def _get_note(state, rng):
+    return {"url": f"{API}/notes/{_pick(state, 'notes', rng)}"}
+
+
+@op("update_note", "PATCH", f"{API}/notes/{{note_id}}")
+def _update_note(state, rng):
+    return {"url": f"{API}/notes/{_pick(state, 'notes', rng)}", "json": {"content": words(rng, 80)}}
+
+
+@op("delete_note", "DELETE", f"{API}/notes/{{note_id}}", expect=(204,))
+def _delete_note(state, rng):
+    note_id = _pop_spare(state, "notes")
+    return {"url": f"{API}/notes/{note_id}"} if note_id else None
+
+
+# ── Insights ──────────────────────────────────────────────────────────────────
+
+@op("list_insights", "GET", f"{API}/insights")
+def _list_insights(state, rng):
+    params = {"limit": 50}
+    if rng.random() < 0.5:
+        params["status"] = rng.choice(INSIGHT_STATUSES)
+    if rng.random() < 0.3:
+        params["created_after"] = _days_ago(90)
+    return {"url": f"{API}/insights", "params": params}
+
+
+@op("create_insight", "POST", f"{API}/insights", expect=(201,), creates="insights")
+def _create_insight(state, rng):
+    return {"url": f"{API}/insights", "json": {
+        "topic_id": _pick(state, "topics", rng),
+        "title": words(rng, 8).capitalize(),
+        "content": words(rng, 50),
+        "evidence": [words(rng, 8) for _ in range(2)],
+        "evidence_sources": [{"source_id": _pick(state, "sources", rng), "quote": words(rng, 12)}],
+        "confidence": rng.choice(LEVELS),
+        "impact": rng.choice(LEVELS),
+        "author": rng.choice(AUTHORS),
+    }}
+
+
+@op("get_insight", "GET", f"{API}/insights/{{insight_id}}")
+def _get_insight(state, rng):
+    return {"url": f"{API}/insights/{_pick(state, 'insights', rng)}"}
+
+
+@op("update_insight", "PATCH", f"{API}/insights/{{insight_id}}")
+def _update_insight(state, rng):
+    return {"url": f"{API}/insights/{_pick(state, 'insights', rng)}", "json": {"status": rng.choice(INSIGHT_STATUSES)}}
+
+
+@op("delete_insight", "DELETE", f"{API}/insights/{{insight_id}}", expect=(204,))
+def _delete_insight(state, rng):
+    insight_id = _pop_spare(state, "insights")
+    return {"url": f"{API}/insights/{insight_id}"} if insight_id else None
+
+
+# ── Collections ───────────────────────────────────────────────────────────────
+
+@op("list_collections", "GET", f"{API}/collections")
+def _list_collections(state, rng):
+    return {"url": f"{API}/collections", "params": {"limit": 50}}
+
+
+@op("create_collection", "POST", f"{API}/collections", expect=(201,), creates="collections")
+def _create_collection(state, rng):
+    return {"url": f"{API}/collections", "json": {
+        "name": words(rng, 3).title(),
+        "topic_ids": rng.sample(state.ids["topics"], 2),
+        "source_ids": rng.sample(state.ids["sources"], 5),
+        "created_by": rng.choice(AUTHORS),
+    }}
+
+
+@op("get_collection", "GET", f"{API}/collections/{{collection_id}}")
+def _get_collection(state, rng):
+    return {"url": f"{API}/collections/{_pick(state, 'collections', rng)}"}
+
+
+@op("update_collection", "PATCH", f"{API}/collections/{{collection_id}}")
+def _update_collection(state, rng):
+    return {"url": f"{API}/collections/{_pick(state, 'collections', rng)}", "json": {"shared": rng.random() > 0.5}}
+
+
+@op("delete_collection", "DELETE", f"{API}/collections/{{collection_id}}", expect=(204,))
+def _delete_collection(state, rng):
+    collection_id = _pop_spare(state, "collections")
+    return {"url": f"{API}/collections/{collection_id}"} if collection_id else None
+
+
+# ── Search & dashboard ────────────────────────────────────────────────────────
+
+@op("search", "GET", f"{API}/search")
+def _search(state, rng):
+    # Mostly single-word hits, some two-word phrases and some misses
+    roll = rng.random()
+    if roll < 0.6:
+        q = rng.choice(WORDS)
+    elif roll < 0.9:
+        q = words(rng, 2)
+    else:
+        q = f"zz{rng.getrandbits(16):x}"
+    return {"url": f"{API}/search", "params": {"q": q, "limit": 20}}
+
+
+@op("search_faceted", "GET", f"{API}/search")
+def _search_faceted(state, rng):
+    # Hits with every facet's counts, sometimes drilled down to one topic
+    params = {"q": rng.choice(WORDS), "limit": 20, "facets": "result_type,topic_id,credibility,status"}
+    if rng.random() < 0.3:
+        params["topic_id"] = _pick(state, "topics", rng)
+    return {"url": f"{API}/search", "params": params}
+
+
+@op("search_fuzzy", "GET", f"{API}/search")
+def _search_fuzzy(state, rng):
+    # A word with one letter dropped, as typed in a hurry
+    word = rng.choice([w for w in WORDS if len(w) >= 5])
+    i = rng.randrange(1, len(word) - 1)
+    return {"url": f"{API}/search", "params": {"q": word[:i] + word[i + 1:], "mode": "fuzzy", "limit": 20}}
+
+
+@op("list_saved_search_hits", "GET", f"{API}/saved-searches/{{saved_search_id}}/new")
+def _list_saved_search_hits(state, rng):
+    if not state.ids.get("saved_searches"):   # a corpus seeded before saved searches existed
+        return None
+    return {"url": f"{API}/saved-searches/{_pick(state, 'saved_searches', rng)}/new", "params": {"limit": 20}}
+
+
+@op("suggest", "GET", f"{API}/suggest")
+def _suggest(state, rng):
+    # A keystroke-by-keystroke prefix of one word
+    word = rng.choice(WORDS)
+    return {"url": f"{API}/suggest", "params": {"q": word[:rng.randint(1, len(word))]}}
+
+
+@op("dashboard", "GET", f"{API}/dashboard")
+def _dashboard(state, rng):
+    return {"url": f"{API}/dashboard"}
+
+
+# ── Batch get ─────────────────────────────────────────────────────────────────
+
+def _batch_get(resource):
+    def build(state, rng):
+        ids = rng.sample(state.ids[resource], min(50, len(state.ids[resource])))
+        return {"url": f"{API}/{resource}/batch-get", "json": {"ids": ids}}
+    return build
+
+
+for _resource in RESOURCES:
+    op(f"batch_get_{_resource}", "POST", f"{API}/{_resource}/batch-get")(_batch_get(_resource))
+
+
+# ── Bulk writes ───────────────────────────────────────────────────────────────
+# Updates are scoped to one topic; deletes only count (dry_run) to keep the corpus intact
+
+@op("bulk_update_insights", "PATCH", f"{API}/insights")
+def _bulk_update_insights(state, rng):
+    params = {"topic_id": _pick(state, "topics", rng), "status": rng.choice(INSIGHT_STATUSES)}
+    return {"url": f"{API}/insights", "params": params, "json": {"status": rng.choice(INSIGHT_STATUSES)}}
+
+
+@op("bulk_update_sources", "PATCH", f"{API}/sources")
+def _bulk_update_sources(state, rng):
+    params = {"topic_id": _pick(state, "topics", rng), "credibility": rng.choice(LEVELS)}
+    return {"url": f"{API}/sources", "params": params, "json": {"credibility": rng.choice(LEVELS)}}
+
+
+@op("bulk_update_notes", "PATCH", f"{API}/notes")
+def _bulk_update_notes(state, rng):
+    params = {"topic_id": _pick(state, "topics", rng), "author": rng.choice(AUTHORS)}
+    return {"url": f"{API}/notes", "params": params, "json": {"author": rng.choice(AUTHORS)}}
+
+
+def _bulk_delete_dry_run(resource):
+    def build(state, rng):
+        return {"url": f"{API}/{resource}", "params": {"topic_id": _pick(state, "topics", rng), "dry_run": True}}
+    return build
+
+
+for _resource in ("sources", "notes", "insights"):
+    op(f"bulk_delete_{_resource}", "DELETE", f"{API}/{_resource}")(_bulk_delete_dry_run(_resource))
+
+
+@op("get_job", "GET", f"{API}/jobs/{{job_id}}")
+def _get_job(state, rng):
+    return {"url": f"{API}/jobs/{rng.choice(state.spare['jobs'])}"} if state.spare["jobs"] else None
+
+
+@op("activity", "GET", f"{API}/activity")
+def _activity(state, rng):
+    params = {"bucket": rng.choice(["day", "week"]), "from": "2000-01-01"}
+    if rng.random() < 0.5:
+        params["topic_id"] = _pick(state, "topics", rng)
+    if rng.random() < 0.5:
+        params["group_by"] = rng.choice(["topic", "author"])
+    return {"url": f"{API}/activity", "params": params}
+
+
+@op("list_changes", "GET", f"{API}/changes")
+def _list_changes(state, rng):
+    return {"url": f"{API}/changes", "params": {"limit": 200}}
+
+
+# ── Mixes ─────────────────────────────────────────────────────────────────────
+
+_EVERY_OP = {name: 1 for name in OPS}
+
+MIXES: Dict[str, Dict[str, int]] = {
+    "read-heavy": {
+        **_EVERY_OP,
+        "root_dashboard": 4, "dashboard": 8,
+        "list_topics": 8, "get_topic": 10, "list_topic_sources": 10, "list_topic_insights": 10,
+        "list_sources": 10, "get_source": 12, "list_source_insights": 4, "list_notes": 8, "get_note": 8,
+        "list_insights": 8, "get_insight": 8, "list_collections": 4, "get_collection": 6,
+        "search": 4, "list_changes": 2,
+        "batch_get_sources": 4, "batch_get_topics": 2, "list_topic_stats": 2, "get_topic_stats": 6,
+        "activity": 4,
+    },
+    "ingest-heavy": {
+        **_EVERY_OP,
+        "create_source": 20, "create_note": 30, "create_note_idempotent": 10, "create_note_buffered": 10,
+        "create_insight": 10, "create_topic": 2,
+        "update_source": 8, "update_note": 6, "update_insight": 8, "update_topic": 2,
+        "delete_source": 3, "delete_note": 5, "delete_insight": 2,
+        "bulk_update_insights": 2, "bulk_update_sources": 2, "bulk_update_notes": 2,
+        "list_sources": 4, "list_notes": 4, "get_source": 4,
+    },
+    "search-heavy": {
+        **_EVERY_OP,
+        "search": 60, "search_faceted": 20, "search_fuzzy": 20, "suggest": 40, "list_saved_search_hits": 10,
+        "dashboard": 6, "get_source": 8, "get_note": 6, "get_insight": 6, "list_sources": 4,
+    },
+}
+
+
+def choose(mix: Dict[str, int], rng: random.Random) -> Op:
+    names = list(mix)
+    return OPS[rng.choices(names, weights=[mix[n] for n in names])[0]]